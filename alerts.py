@@ -0,0 +1,169 @@
+import hashlib
+from string import Formatter
+
+import numpy as np
+from markupsafe import escape
+
+SOIL, SUBSIDY, WEATHER = "soil", "subsidy", "weather"
+ALERT_CHUNK_SIZE = 5000
+
+# The per-user advice of the Soil Health, Government Aid and Real-Time
+# Weather pages. A rule fires when every (column, op, value) condition in
+# "when" holds for a user's latest FarmData row; conditions in "live" are
+# checked against current values (the weather) when the page is shown.
+# Messages are trusted HTML; placeholders are filled with escaped values.
+RULES = (
+    {"code": "ph_low", "feature": SOIL, "when": [("soil_ph", "<", 6.0)],
+     "message": "Soil pH is low; consider applying lime. (<a href='https://www.nrcs.usda.gov/wps/portal/nrcs/main/soils/health/' target='_blank'>NRCS Guidelines</a>)"},
+    {"code": "ph_high", "feature": SOIL, "when": [("soil_ph", ">", 7.0)],
+     "message": "Soil pH is high; add elemental sulfur or organic matter."},
+    {"code": "ph_ok", "feature": SOIL, "when": [("soil_ph", "between", (6.0, 7.0))],
+     "message": "Soil pH is optimal."},
+    {"code": "moisture_low", "feature": SOIL, "when": [("soil_moisture", "<", 30)],
+     "message": "Soil moisture is low; increase irrigation or cover crops."},
+    {"code": "moisture_high", "feature": SOIL, "when": [("soil_moisture", ">", 30)],
+     "message": "Soil moisture is high; consider improved drainage."},
+    {"code": "moisture_ok", "feature": SOIL, "when": [("soil_moisture", "==", 30)],
+     "message": "Soil moisture is optimal."},
+    {"code": "loan_programs", "feature": SUBSIDY, "when": [("city", "present")],
+     "message": "Explore loan programs available in {city}."},
+    {"code": "cover_crop_grants", "feature": SUBSIDY, "when": [("soil_type", "present")],
+     "message": "Your {soil_type} soil may qualify for cover crop grants."},
+    {"code": "specialty_crop_aid", "feature": SUBSIDY, "when": [("crop_history", "present")],
+     "message": "Since you grow {first_crop}, you might be eligible for specialty crop aid."},
+    {"code": "eqip", "feature": SUBSIDY, "when": [("fertilizer_usage", "present")],
+     "message": "Fertilizer usage noted—check out EQIP for funding."},
+    {"code": "pest_subsidies", "feature": SUBSIDY, "when": [("pest_issues", "present")],
+     "message": "Pest issues reported—explore pest control subsidies."},
+    {"code": "drought_assistance", "feature": SUBSIDY, "when": [("rainfall", "empty")],
+     "message": "If your farm is mainly rain-fed, consider drought assistance."},
+    {"code": "irrigate_warm", "feature": WEATHER, "when": [("soil_moisture", "<", 90)], "live": [("temp", ">", 20)],
+     "message": "Soil moisture is low and it's warm; consider extra irrigation."},
+    {"code": "low_rainfall", "feature": WEATHER, "when": [("rainfall", "<", 10)],
+     "message": "Low rainfall detected—supplemental watering might be needed."},
+)
+
+NUMERIC_COLUMNS = ("soil_ph", "soil_moisture", "rainfall")
+TEXT_COLUMNS = ("city", "soil_type", "crop_history", "fertilizer_usage", "pest_issues")
+# Every FarmData column the rules read, in the order column_arrays() expects rows.
+COLUMNS = ("id", "user_id") + NUMERIC_COLUMNS + TEXT_COLUMNS
+
+OPS = {
+    "<": lambda col, v: col < v,
+    "<=": lambda col, v: col <= v,
+    ">": lambda col, v: col > v,
+    ">=": lambda col, v: col >= v,
+    "==": lambda col, v: col == v,
+    "between": lambda col, v: (col >= v[0]) & (col <= v[1]),
+    # Python truthiness, as the old `if data.city:` checks: NaN, 0, None and "" are empty.
+    "present": lambda col, v: col,
+    "empty": lambda col, v: ~col,
+}
+
+
+def rules_version(rules=RULES):
+    return hashlib.sha1(repr(rules).encode()).hexdigest()[:12]
+
+
+def column_arrays(rows):
+    """Column name -> array for a chunk of rows in COLUMNS order.
+
+    Numeric columns are float arrays with NaN for NULL, which every
+    comparison treats as false. Text columns become truthiness masks; the
+    values themselves are only looked up for the alerts that fire.
+    """
+    rows = list(rows)
+    values = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    columns = dict(zip(COLUMNS, values))
+    arrays = {}
+    for name in NUMERIC_COLUMNS:
+        arrays[name] = np.array([np.nan if v is None else v for v in columns[name]], dtype=float)
+    for name in TEXT_COLUMNS:
+        arrays[name] = np.fromiter((bool(v) for v in columns[name]), dtype=bool, count=len(rows))
+    return arrays, columns
+
+
+def _truthy(array):
+    # "present"/"empty" on a numeric column mean non-zero and not NULL.
+    if array.dtype == bool:
+        return array
+    return ~np.isnan(array) & (array != 0)
+
+
+def compile_conditions(conditions):
+    """One function from column arrays to a boolean mask, for an AND of conditions."""
+    steps = []
+    for column, op, *value in conditions:
+        steps.append((column, op, OPS[op], value[0] if value else None))
+
+    def predicate(arrays, size):
+        mask = np.ones(size, dtype=bool)
+        for column, op, test, value in steps:
+            col = arrays[column]
+            if op in ("present", "empty"):
+                col = _truthy(col)
+            elif col.dtype == bool:
+                raise ValueError(f"{op!r} needs a numeric column, not {column!r}")
+            with np.errstate(invalid="ignore"):
+                mask &= test(col, value)
+        return mask
+    return predicate
+
+
+class RuleSet:
+    """The rule table compiled into vectorized predicates over column arrays."""
+
+    def __init__(self, rules=RULES):
+        self.rules = tuple(rules)
+        self.version = rules_version(self.rules)
+        self.codes = [rule["code"] for rule in self.rules]
+        self.predicates = [compile_conditions(rule["when"]) for rule in self.rules]
+        self.live = {rule["code"]: compile_conditions(rule["live"]) for rule in self.rules if rule.get("live")}
+        # Placeholders per rule, so only the values a message shows get escaped.
+        self.fields = [[name for _, name, _, _ in Formatter().parse(rule["message"]) if name] for rule in self.rules]
+
+    def evaluate(self, arrays, size):
+        """Boolean (rows x rules) matrix of the rules that fire."""
+        fired = np.zeros((size, len(self.rules)), dtype=bool)
+        for j, predicate in enumerate(self.predicates):
+            fired[:, j] = predicate(arrays, size)
+        return fired
+
+    def message(self, j, columns, i):
+        fields = {}
+        for name in self.fields[j]:
+            if name == "first_crop":
+                fields[name] = escape(str(columns["crop_history"][i] or "").split(",")[0].strip())
+            else:
+                fields[name] = escape(columns[name][i] or "")
+        return self.rules[j]["message"].format(**fields) if fields else self.rules[j]["message"]
+
+    def alerts(self, rows):
+        """Alert rows (user_id, farmdata_id, code, feature, message) for a chunk of FarmData rows."""
+        arrays, columns = column_arrays(rows)
+        size = len(columns["id"])
+        if not size:
+            return []
+        # np.nonzero walks the matrix row by row, so each user's alerts come out in rule order.
+        found = []
+        for i, j in zip(*np.nonzero(self.evaluate(arrays, size))):
+            rule = self.rules[j]
+            found.append({
+                "user_id": columns["user_id"][i],
+                "farmdata_id": columns["id"][i],
+                "code": rule["code"],
+                "feature": rule["feature"],
+                "message": self.message(j, columns, i),
+            })
+        return found
+
+    def applies_now(self, code, **live):
+        """Checks a fired rule's live conditions, e.g. applies_now(code, temp=72.0)."""
+        predicate = self.live.get(code)
+        if predicate is None:
+            return True
+        arrays = {name: np.array([np.nan if v is None else v], dtype=float) for name, v in live.items()}
+        return bool(predicate(arrays, 1)[0])
+
+
+rule_set = RuleSet()
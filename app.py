@@ -1,18 +1,58 @@
 
+import glob
+import hashlib
+import io
+import itertools
+import json
+import logging
 import os
+import sys
+import time
 import uuid
 
-import pandas as pd
-import requests
-from flask import Flask, render_template, request, redirect, url_for, session
+import click
+from flask import Flask, Response, current_app, g, has_request_context, make_response, render_template, request, redirect, url_for, session, jsonify, send_from_directory, stream_with_context
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import event, func, insert, select
+from datetime import date, datetime, timedelta
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'a_default_secret_key')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///farmdata.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+import migrations
+from lru import LRUCache
+from metrics import CONTENT_TYPE, registry, stage
+from reference_data import reference_store
+from alerts import ALERT_CHUNK_SIZE, COLUMNS as ALERT_COLUMNS, SOIL, SUBSIDY, WEATHER, rule_set
+from crops import crop_registry, decode_suggestions, encode_suggestions
+from prices import price_store
+from harvest import HARVEST_MIN_SCORE, HARVEST_WINDOW_DAYS, DailyForecast, current_harvest_optimizer, plan_users
+from rotation import PLAN_YEARS
+from scoring import current_scorer, parse_profile, recommend, recommendation_cache
+from yield_index import current_yield_index
+from model_registry import model_registry
+from yield_grid import current_yield_grid
+from weather import WeatherPrefetcher, weather_client
+from write_path import GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_DELAY, SQLITE_PRAGMAS, GroupCommitter, apply_sqlite_pragmas
+from jobs import JOB_WORKERS, JobQueue
+from preload import process_memory, share_reference_data
+from static_images import BUILD_DIR, FORMATS, IMMUTABLE_MAX_AGE, build_images, image_manifest
+from batch import BATCH_SIZE, JSONL_MIMETYPES, chunked, iter_jsonl, stream_recommendations
+from ingest import CSV_MIMETYPES, INGEST_CHUNK_SIZE, ingest, records
+
+db = SQLAlchemy()
+log = logging.getLogger(__name__)
+
+REQUEST_SECONDS = registry.histogram(
+    "farmer_request_seconds", "Request latency by endpoint, method and status.", ("endpoint", "method", "status"))
+FEATURE_SECONDS = registry.histogram(
+    "farmer_feature_seconds", "feature_details latency by feature.", ("feature",))
+DB_QUERIES = registry.histogram(
+    "farmer_db_queries_per_request", "SQL statements executed per request.", ("endpoint",),
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100))
+INGESTED_ROWS = registry.counter(
+    "farmer_ingested_rows_total", "Sensor readings received by /api/observations and flask ingest.", ("result",))
+
+# Templates compiled during startup so the first request doesn't pay for it.
+PRELOADED_TEMPLATES = ("index.html", "feature.html", "input_form.html", "submission.html")
 
 
 class FarmData(db.Model):
@@ -29,34 +69,308 @@ class FarmData(db.Model):
     pest_issues = db.Column(db.Text, nullable=True)
     city = db.Column(db.String(100), nullable=True)
     suggestions = db.Column(db.Text, nullable=True)
+    field = db.Column(db.String(64), nullable=True)  # set by sensor ingestion
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    
+    __table_args__ = (
+        db.Index("ix_farmdata_user_submitted", "user_id", "submitted_at"),
+        db.Index("ix_farmdata_submitted_city", "submitted_at", "city"),
+    )
+
     def __repr__(self):
         return f"<FarmData id={self.id} user_id={self.user_id}>"
 
-@app.before_request
-def before_request():
+class Alert(db.Model):
+    """Precomputed page advice for a user's latest FarmData row; see alerts.RULES."""
+    __tablename__ = "alerts"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(36), nullable=False)
+    farmdata_id = db.Column(db.Integer, nullable=False)
+    code = db.Column(db.String(32), nullable=False)
+    feature = db.Column(db.String(16), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    rules_version = db.Column(db.String(12), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        db.Index("ix_alerts_user_farmdata", "user_id", "farmdata_id"),
+    )
+
+DEFAULT_CITY = "Chester Springs"
+# Users who submitted within this window count as active for weather prefetching.
+ACTIVE_USER_WINDOW = timedelta(days=int(os.environ.get("WEATHER_PREFETCH_ACTIVE_DAYS", 7)))
+
+def active_cities(app):
+    cutoff = datetime.utcnow() - ACTIVE_USER_WINDOW
+    with app.app_context():
+        rows = (db.session.query(FarmData.city)
+                .filter(FarmData.submitted_at >= cutoff, FarmData.city.isnot(None))
+                .distinct().all())
+    return [DEFAULT_CITY] + [city for (city,) in rows]
+
+
+def farm_data_from_form(form, user_id):
+    return FarmData(
+        user_id=user_id,
+        soil_type=form.get("soil_type"),
+        soil_ph=float(form.get("soil_ph") or 6.5),
+        soil_moisture=float(form.get("soil_moisture") or 0),
+        temperature=float(form.get("temperature") or 0),
+        rainfall=float(form.get("rainfallAmount") or 0),
+        crop_history=form.get("crop_history"),
+        fertilizer_usage=form.get("fertilizer_usage"),
+        pest_issues=form.get("pest_issues"),
+        city=form.get("location")
+    )
+
+def row_values(data):
+    """Column values of an unsaved FarmData row, for Core-level inserts."""
+    values = {c.name: getattr(data, c.name) for c in FarmData.__table__.columns if c.name != "id"}
+    if values["submitted_at"] is None:
+        values["submitted_at"] = datetime.utcnow()
+    return values
+
+def persist_recommendations(raw_profiles, results, user_id=None):
+    rows = []
+    for raw, result in zip(raw_profiles, results):
+        if "suggestions" not in result:
+            continue
+        try:
+            row = farm_data_from_form(raw, raw.get("user_id") or user_id or str(uuid.uuid4()))
+        except (TypeError, ValueError) as exc:
+            result["error"] = f"not saved: {exc}"
+            continue
+        row.suggestions = encode_suggestions(result["suggestions"])
+        rows.append((row, result))
+    db.session.add_all([row for row, _ in rows])
+    with stage("db_commit"):
+        db.session.commit()
+    for row, result in rows:
+        result["id"] = row.id
+        invalidate_latest_submission(row.user_id)
+
+# Profile columns a reading inherits from the user's previous row, so the
+# latest submission stays complete when a sensor only reports some values.
+CARRIED_COLUMNS = ("soil_type", "soil_ph", "soil_moisture", "temperature", "rainfall", "crop_history",
+                   "fertilizer_usage", "pest_issues", "city", "suggestions", "field")
+
+class ObservationWriter:
+    """Stores validated readings as FarmData rows, one transaction per chunk."""
+
+    def __init__(self):
+        self.latest = {}
+
+    def _previous(self, user_ids):
+        missing = [u for u in user_ids if u not in self.latest]
+        for user_id in missing:
+            self.latest[user_id] = {}
+        table = FarmData.__table__
+        columns = [table.c[name] for name in CARRIED_COLUMNS + ("user_id", "submitted_at")]
+        for part in chunked(missing, 500):
+            # Per-user max(submitted_at) is answered from ix_farmdata_user_submitted.
+            newest = (select(table.c.user_id, func.max(table.c.submitted_at).label("submitted_at"))
+                      .where(table.c.user_id.in_(part)).group_by(table.c.user_id).subquery())
+            query = select(*columns).join(newest, (table.c.user_id == newest.c.user_id)
+                                          & (table.c.submitted_at == newest.c.submitted_at))
+            for row in db.session.execute(query).mappings():
+                self.latest[row["user_id"]] = {c: row[c] for c in CARRIED_COLUMNS + ("submitted_at",)}
+
+    def __call__(self, readings):
+        self._previous({r["user_id"] for r in readings})
+        rows = []
+        for reading in readings:
+            previous = self.latest[reading["user_id"]]
+            row = {c: previous.get(c) for c in CARRIED_COLUMNS}
+            row.update(reading)
+            rows.append(row)
+            if not previous or reading["submitted_at"] >= previous["submitted_at"]:
+                self.latest[reading["user_id"]] = row
+        with stage("db_commit"):
+            db.session.connection().execute(insert(FarmData.__table__), rows)
+            db.session.commit()
+        for user_id in {r["user_id"] for r in readings}:
+            invalidate_latest_submission(user_id)
+
+def ingest_observations(stream, fmt, default_user=None, chunk_size=INGEST_CHUNK_SIZE):
+    report = ingest(records(stream, fmt), ObservationWriter(), default_user, chunk_size)
+    INGESTED_ROWS.inc(report["accepted"], result="accepted")
+    INGESTED_ROWS.inc(report["rejected"], result="rejected")
+    return report
+
+def predict_yield(temperature, rainfall, soil_ph):
+    point = (temperature, rainfall, soil_ph)
+    grid = current_yield_grid()
+    if grid is not None and grid.contains(point)[0]:
+        return grid.predict(*point)
+    model = model_registry.get()
+    if model is not None:
+        return model.predict(*point)
+    return current_yield_index().predict(*point)
+
+# Cross-request cache of each user's latest submission. Off by default: with
+# several workers, a /submit handled elsewhere is only seen after the TTL.
+latest_cache = LRUCache(int(os.environ.get("LATEST_SUBMISSION_CACHE_SIZE", 0)),
+                        float(os.environ.get("LATEST_SUBMISSION_CACHE_TTL", 30)))
+_NOT_CACHED = object()
+
+def _detached_copy(row):
+    if row is None:
+        return None
+    return FarmData(**{c.name: getattr(row, c.name) for c in FarmData.__table__.columns})
+
+def latest_submission():
+    """The current user's most recent FarmData row, loaded at most once per request."""
+    if "latest_submission" not in g:
+        user_id = session.get('user_id')
+        row = latest_cache.get(user_id, _NOT_CACHED)
+        if row is _NOT_CACHED:
+            row = FarmData.query.filter_by(user_id=user_id).order_by(FarmData.submitted_at.desc(), FarmData.id.desc()).first()
+            # A row still waiting for its suggestions job isn't cached: a copy
+            # taken just before the job's commit would outlive its invalidation.
+            if row is None or row.suggestions:
+                latest_cache.set(user_id, _detached_copy(row))
+        g.latest_submission = row
+    return g.latest_submission
+
+def invalidate_latest_submission(user_id):
+    latest_cache.pop(user_id)
+    page_cache.discard_where(lambda key: key[0] == user_id)
+    g.pop("latest_submission", None)
+
+# Feature pages whose GET output depends only on the user's latest submission
+# (plus reference data and query args), never on live weather.
+CACHED_FEATURES = {
+    "Crop Recommendation", "Government Aid & Subsidy Info", "Soil Health Monitoring",
+    "Market Price Alerts", "Crop Rotation Planning", "Fertilizer & Water Usage Recommendations",
+    "AI-Based Yield Prediction",
+}
+page_cache = LRUCache(int(os.environ.get("PAGE_CACHE_SIZE", 1024)))
+
+def _page_version():
+    """Hash of every module and template a page can render from.
+
+    Covers all of the app's .py files and templates, so a deploy that
+    changes any of them (alert messages, harvest planning, index.html...)
+    gets new ETags and cache keys. Hashed by content, so every host serving
+    the same release agrees on it.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = sorted(glob.glob(os.path.join(root, "*.py")) +
+                   glob.glob(os.path.join(root, "templates", "**", "*.html"), recursive=True))
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(os.path.relpath(path, root).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+PAGE_VERSION = _page_version()
+
+def upgrade_schema():
     db.create_all()
+    return migrations.upgrade(db.engine)
+
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db_command():
+    """Create missing tables and apply pending schema migrations."""
+    click.echo(f"Schema at version {upgrade_schema()}")
+
+def before_request():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
     if 'user_id' not in session:
         session['user_id'] = str(uuid.uuid4())
 
+def record_request_metrics(response):
+    if "request_started" in g:
+        endpoint = request.endpoint or "none"
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started,
+                                endpoint=endpoint, method=request.method, status=response.status_code)
+        DB_QUERIES.observe(g.db_queries, endpoint=endpoint)
+    return response
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "db_queries" in g:
+        g.db_queries += 1
+
+def user_alerts(data, feature):
+    """(code, message) of the rules that fire for a FarmData row, in rule order.
+
+    Read from the alerts table that `flask refresh-alerts` fills; a row the
+    batch job hasn't seen yet (or one scored with older rules) is evaluated
+    on the spot with the same compiled rules.
+    """
+    stored = db.session.execute(
+        select(Alert.code, Alert.feature, Alert.message)
+        .where(Alert.user_id == data.user_id, Alert.farmdata_id == data.id,
+               Alert.rules_version == rule_set.version)
+        .order_by(Alert.id)).all()
+    if not stored:
+        row = tuple(getattr(data, column) for column in ALERT_COLUMNS)
+        stored = [(a["code"], a["feature"], a["message"]) for a in rule_set.alerts([row])]
+    return [(code, message) for code, kind, message in stored if kind == feature]
+
 def personalize_subsidy_info(data):
-    msgs = []
-    if data.city:
-        msgs.append(f"Explore loan programs available in {data.city}.")
-    if data.soil_type:
-        msgs.append(f"Your {data.soil_type} soil may qualify for cover crop grants.")
-    if data.crop_history:
-        crop = data.crop_history.split(',')[0].strip()
-        msgs.append(f"Since you grow {crop}, you might be eligible for specialty crop aid.")
-    if data.fertilizer_usage:
-        msgs.append("Fertilizer usage noted—check out EQIP for funding.")
-    if data.pest_issues:
-        msgs.append("Pest issues reported—explore pest control subsidies.")
-    if data.rainfall is None or data.rainfall == 0:
-        msgs.append("If your farm is mainly rain-fed, consider drought assistance.")
+    msgs = [message for _, message in user_alerts(data, SUBSIDY)]
     return "<ul>" + "".join(f"<li>{m}</li>" for m in msgs) + "</ul>"
 
+def latest_row_chunks(columns, chunk_size=1000):
+    """Every user's newest FarmData row, chunk_size users at a time, in user_id order.
+
+    Yields lists of tuples of `columns`. Users are paged by keyset on
+    user_id, so each chunk is one indexed query and memory stays at one
+    chunk however large farmdata is. Rows tied on submitted_at resolve
+    to the later insert, as latest_submission() does.
+    """
+    table = FarmData.__table__
+    last_user = ""
+    while True:
+        newest = (select(table.c.user_id, func.max(table.c.submitted_at).label("submitted_at"))
+                  .where(table.c.user_id > last_user)
+                  .group_by(table.c.user_id).order_by(table.c.user_id).limit(chunk_size).subquery())
+        query = (select(table.c.user_id, *[table.c[name] for name in columns])
+                 .join(newest, (table.c.user_id == newest.c.user_id) & (table.c.submitted_at == newest.c.submitted_at))
+                 .order_by(table.c.user_id, table.c.id))
+        latest = {}
+        for user_id, *values in db.session.execute(query):
+            latest[user_id] = tuple(values)
+        if not latest:
+            return
+        last_user = next(reversed(latest))
+        yield list(latest.values())
+
+def refresh_alerts(chunk_size=ALERT_CHUNK_SIZE):
+    """Re-evaluates every rule for every user's latest row, chunk_size users at a time.
+
+    Users are walked in user_id order by keyset, so memory stays at one
+    chunk however large farmdata is, and each chunk's old alerts are
+    replaced by one range delete and one insert in a single transaction.
+    """
+    table = Alert.__table__
+    report = {"users": 0, "alerts": 0, "chunks": 0}
+    start = time.perf_counter()
+    last_user = ""
+    for rows in latest_row_chunks(ALERT_COLUMNS, chunk_size):
+        found = rule_set.alerts(rows)
+        first, last = last_user, max(row[1] for row in rows)
+        for alert in found:
+            alert["rules_version"] = rule_set.version
+        with stage("db_commit"):
+            db.session.execute(table.delete().where(table.c.user_id > first, table.c.user_id <= last))
+            if found:
+                db.session.connection().execute(insert(table), found)
+            db.session.commit()
+        report["users"] += len(rows)
+        report["alerts"] += len(found)
+        report["chunks"] += 1
+        last_user = last
+    # Users past the last chunk no longer have FarmData rows.
+    db.session.execute(table.delete().where(table.c.user_id > last_user))
+    db.session.commit()
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 3)
+    report["users_per_second"] = round(report["users"] / elapsed) if elapsed > 0 else None
+    return report
+
 # Basic static data
 basic_crop_recommendation_info = {
     "soil_types": {
@@ -168,48 +482,7 @@ fertilizer_water_data = {
     "Gandules (Pigeon Peas)": {"NPK": "10-20-10", "irrigation": "Drip", "water_needs": "Moderate", "tips": "Maintain even soil moisture."},
     "Collards (Cabbage Family)": {"NPK": "10-15-10", "irrigation": "Sprinkler", "water_needs": "Moderate", "tips": "Consistent moisture supports leafy greens."}
 }
-
-default_market_prices = {
-    "Peas": 2.50,
-    "Fava Beans": 2.80,
-    "Onions": 1.20,
-    "Leeks": 1.50,
-    "Garlic": 4.00,
-    "Greens (Collards, Kale, Mustard, Turnip, Etc.)": 1.10,
-    "Turnips": 0.90,
-    "White Potatoes": 0.75,
-    "Cabbage": 1.00,
-    "Lettuce": 1.20,
-    "Radishes": 1.10,
-    "Beets": 1.50,
-    "Carrots": 1.30,
-    "Shallots": 3.00,
-    "Spinach": 1.40,
-    "Bok Choy": 1.60,
-    "Parsley": 2.00,
-    "Swiss Chard": 1.50,
-    "Celery": 1.30,
-    "Watermelons": 0.50,
-    "Winter Squash": 0.80,
-    "Melons": 0.70,
-    "Summer Squash": 0.60,
-    "Cucumbers": 0.90,
-    "Pumpkins": 0.80,
-    "Sweet Potato": 1.00,
-    "Okra": 2.50,
-    "Chinese Cabbage": 1.10,
-    "Sweet Corn": 3.25,
-    "Peanuts": 2.20,
-    "Lima Beans": 2.80,
-    "Beans (Bush, Pole, Shell, Dried)": 2.50,
-    "Black-Eyed Peas": 2.30,
-    "Eggplant": 1.50,
-    "Peppers": 2.00,
-    "Tomato": 1.80,
-    "Basil": 3.00,
-    "Gandules (Pigeon Peas)": 2.50,
-    "Collards (Cabbage Family)": 1.20
-}
+fertilizer_water_by_crop = crop_registry.table(fertilizer_water_data)
 
 features = [
     {"name": "Crop Recommendation", "description": "Suggests the best crop based on soil type, weather, and month.", "benefit": "Helps farmers choose the right crop for higher yield & profit.", "image": "basic_crop.png"},
@@ -223,9 +496,8 @@ features = [
     {"name": "AI-Based Yield Prediction", "description": "Uses machine learning to predict crop yield based on weather, soil, and planting time.", "benefit": "Helps farmers make data-driven decisions to improve productivity.", "image": "ai_yield.png"}
 ]
 
-@app.route("/")
 def home():
-    latest_data = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+    latest_data = latest_submission()
     if latest_data:
         info = {
             "greeting": f"Hello farmer from {latest_data.city}!",
@@ -233,7 +505,7 @@ def home():
             "soil_ph": latest_data.soil_ph,
             "temperature": latest_data.temperature,
             "rainfall": latest_data.rainfall,
-            "suggestions": latest_data.suggestions.split(",") if latest_data.suggestions else []
+            "suggestions": decode_suggestions(latest_data.suggestions)
         }
     else:
         info = {
@@ -246,20 +518,55 @@ def home():
         }
     return render_template("index.html", features=features, personalized_info=info)
 
-@app.route("/feature/<name>", methods=["GET", "POST"])
 def feature_details(name):
     feature = next((f for f in features if f['name'] == name), None)
     if not feature:
         return "Feature not found", 404
+    with FEATURE_SECONDS.time(feature=feature['name']):
+        if request.method == "GET" and feature['name'] in CACHED_FEATURES:
+            return cached_feature_page(feature)
+        return render_feature(feature)
+
+def cached_feature_page(feature):
+    """Serves a feature page from page_cache, or 304 if the client's copy is current.
+
+    Keyed by (user, feature, latest FarmData id); the ETag is derived from the
+    key, so a revalidation is answered without rendering anything.
+    """
+    latest = latest_submission()
+    if latest is not None and not latest.suggestions and current_app.config['ASYNC_RECOMMENDATIONS']:
+        # Suggestions still on their way; the page changes without a new row.
+        return render_feature(feature)
+    key = (session.get('user_id'), feature['name'], latest.id if latest else None,
+           request.query_string, reference_store.version(), price_store.version(), image_manifest.version(),
+           rule_set.version, PAGE_VERSION)
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        html = page_cache.get(key)
+        if html is None:
+            html = render_feature(feature)
+            page_cache.set(key, html)
+        response = make_response(html)
+    response.set_etag(etag)
+    if latest is not None:
+        response.last_modified = latest.submitted_at
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def render_feature(feature):
     extra_info = {}
     
     if feature['name'] == "Crop Recommendation":
         extra_info = basic_crop_recommendation_info.copy()
-        latest_data = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest_data = latest_submission()
         if latest_data and latest_data.suggestions:
-            extra_info["finalSuggestions"] = latest_data.suggestions.split(",")
+            extra_info["finalSuggestions"] = decode_suggestions(latest_data.suggestions)
+        elif latest_data and suggestion_status(latest_data) == "pending":
+            extra_info["pending"] = latest_data.id
     elif feature['name'] == "Government Aid & Subsidy Info":
-        latest_data = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest_data = latest_submission()
         static_info = """
         <h4>Government Aid & Subsidy Info in Pennsylvania</h4>
         <p>Pennsylvania offers a range of financial assistance programs aimed at strengthening agribusiness, supporting rural development, and modernizing farming operations. Through the PA Department of Agriculture’s Agricultural Business Development Center, farmers can access:</p>
@@ -283,42 +590,27 @@ def feature_details(name):
             gov_info = static_info
         extra_info = {"gov_info": gov_info}
     elif feature['name'] == "Soil Health Monitoring":
-        latest_data = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest_data = latest_submission()
         recs = []
         if latest_data:
-            ph_range = (6.0, 7.0)
-            moisture_optimal = 30
-            if latest_data.soil_ph < ph_range[0]:
-                recs.append("Soil pH is low; consider applying lime. (<a href='https://www.nrcs.usda.gov/wps/portal/nrcs/main/soils/health/' target='_blank'>NRCS Guidelines</a>)")
-            elif latest_data.soil_ph > ph_range[1]:
-                recs.append("Soil pH is high; add elemental sulfur or organic matter.")
-            else:
-                recs.append("Soil pH is optimal.")
-            if latest_data.soil_moisture < moisture_optimal:
-                recs.append("Soil moisture is low; increase irrigation or cover crops.")
-            elif latest_data.soil_moisture > moisture_optimal:
-                recs.append("Soil moisture is high; consider improved drainage.")
-            else:
-                recs.append("Soil moisture is optimal.")
+            recs.extend(message for _, message in user_alerts(latest_data, SOIL))
             recs.append("Regularly add compost for better soil structure. (<a href='https://soilhealth.acs.edu/' target='_blank'>Soil Health Academy</a>)")
             recs.append("Utilize crop rotation. (<a href='https://www.sare.org/' target='_blank'>SARE</a>)")
         else:
             recs.append("No soil data available. Submit your farm data.")
         extra_info = {"recommendations": recs}
     elif feature['name'] == "Market Price Alerts":
-        extra_info = {"market_prices": default_market_prices}
+        extra_info = {"market_prices": price_store.latest_prices()}
         ps = []
-        latest_data = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest_data = latest_submission()
         if latest_data and latest_data.crop_history:
-            crops = [crop.strip().lower() for crop in latest_data.crop_history.split(",")]
-            mp_lower = {k.lower(): v for k, v in default_market_prices.items()}
-            for crop in crops:
-                if crop in mp_lower:
-                    price = mp_lower[crop]
-                    ps.append(f"{crop.title()}: ${price} per unit; keep monitoring.")
+            for crop_id in crop_registry.ids_of(c.strip() for c in latest_data.crop_history.split(",")):
+                price = price_store.latest(crop_id)
+                if price is not None:
+                    ps.append(f"{crop_registry.name_of(crop_id)}: ${price:.2f} per unit; keep monitoring.")
         extra_info["personalized_suggestions"] = ps
     elif feature['name'] == "Crop Rotation Planning":
-        latest_data = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest_data = latest_submission()
         if latest_data and latest_data.crop_history:
             rotation_schedule = (
                 "Based on your crop history, we recommend planting <strong>Legumes (Nitrogen Fixers)</strong> next. "
@@ -330,18 +622,19 @@ def feature_details(name):
         else:
             rotation_schedule = "No crop history available. Submit your farm data for crop rotation recommendations."
         extra_info = {"rotation_schedule": rotation_schedule}
+        if latest_data and latest_data.crop_history:
+            previous = [c.strip() for c in latest_data.crop_history.split(",") if c.strip()]
+            years = request.args.get("years", PLAN_YEARS, type=int)
+            extra_info["rotation_plan"] = current_scorer().rotation.plan(previous, years)
     elif feature['name'] == "Real-Time Weather":
         city = request.args.get("city")
         if not city:
-            latest = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
-            city = latest.city if (latest and latest.city) else "Chester Springs"
-        api_key = "41634f4abed439fd5c63967222a91b8b"
-        w_url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=imperial"
-        r = requests.get(w_url)
-        if r.status_code == 200:
-            d = r.json()
+            latest = latest_submission()
+            city = latest.city if (latest and latest.city) else DEFAULT_CITY
+        d = weather_client.current(city)
+        if d is not None:
             temp = d["main"]["temp"]
-            print("temp*****",temp)
+            log.debug("weather city=%r temp=%s", city, temp)
             w_desc = d["weather"][0]["description"].capitalize()
             extra_info = {
                 "city": city,
@@ -350,90 +643,43 @@ def feature_details(name):
                 "humidity": d["main"]["humidity"],
                 "wind_speed": d["wind"]["speed"]
             }
-            latest = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+            latest = latest_submission()
             recs = ""
             if latest:
-                if latest.soil_moisture is not None and latest.soil_moisture < 90 and temp > 20:
-                    recs += "Soil moisture is low and it's warm; consider extra irrigation. "
-                if latest.rainfall is not None and latest.rainfall < 10:
-                    recs += "Low rainfall detected—supplemental watering might be needed. "
+                recs = "".join(message + " " for code, message in user_alerts(latest, WEATHER)
+                               if rule_set.applies_now(code, temp=temp))
             extra_info["personalized_recommendations"] = recs
         else:
             extra_info = {"error": "Could not retrieve weather data"}
     elif feature['name'] == "Fertilizer & Water Usage Recommendations":
-        latest = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest = latest_submission()
         rec_list = []
         if latest and latest.suggestions:
-            for crop in latest.suggestions.split(","):
-                crop = crop.strip()
-                if crop in fertilizer_water_data:
-                    rec_list.append({ "crop": crop, **fertilizer_water_data[crop] })
+            for crop_id in crop_registry.ids_of(decode_suggestions(latest.suggestions)):
+                if crop_id >= 0 and fertilizer_water_by_crop[crop_id]:
+                    rec_list.append({"crop": crop_registry.name_of(crop_id), **fertilizer_water_by_crop[crop_id]})
         extra_info = {"recommendations": rec_list}
     elif feature['name'] == "Harvest Optimization":
-        latest = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest = latest_submission()
         if latest and latest.suggestions:
-            s_crops = [c.strip() for c in latest.suggestions.split(",")]
-            city = latest.city if latest.city else "Chester Springs"
-            api_key = "41634f4abed439fd5c63967222a91b8b"
-            w_url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=imperial"
-            r = requests.get(w_url)
-            if r.status_code == 200:
-                w_data = r.json()
+            s_crops = decode_suggestions(latest.suggestions)
+            city = latest.city if latest.city else DEFAULT_CITY
+            w_data = weather_client.current(city)
+            if w_data is not None:
                 temp = w_data["main"]["temp"]
                 w_desc = w_data["weather"][0]["description"].capitalize()
             else:
                 temp = None
                 w_desc = "Unavailable"
-            m_prices = {
-                "Peas": 2.50,
-                "Fava Beans": 2.80,
-                "Onions": 1.20,
-                "Leeks": 1.50,
-                "Garlic": 4.00,
-                "Greens (Collards, Kale, Mustard, Turnip, Etc.)": 1.10,
-                "Turnips": 0.90,
-                "White Potatoes": 0.75,
-                "Cabbage": 1.00,
-                "Lettuce": 1.20,
-                "Radishes": 1.10,
-                "Beets": 1.50,
-                "Carrots": 1.30,
-                "Shallots": 3.00,
-                "Spinach": 1.40,
-                "Bok Choy": 1.60,
-                "Parsley": 2.00,
-                "Swiss Chard": 1.50,
-                "Celery": 1.30,
-                "Watermelons": 0.50,
-                "Winter Squash": 0.80,
-                "Melons": 0.70,
-                "Summer Squash": 0.60,
-                "Cucumbers": 0.90,
-                "Pumpkins": 0.80,
-                "Sweet Potato": 1.00,
-                "Okra": 2.50,
-                "Chinese Cabbage": 1.10,
-                "Sweet Corn": 3.25,
-                "Peanuts": 2.20,
-                "Lima Beans": 2.80,
-                "Beans (Bush, Pole, Shell, Dried)": 2.50,
-                "Black-Eyed Peas": 2.30,
-                "Eggplant": 1.50,
-                "Peppers": 2.00,
-                "Tomato": 1.80,
-                "Basil": 3.00,
-                "Gandules (Pigeon Peas)": 2.50,
-                "Collards (Cabbage Family)": 1.20
-            }
-            recs = []
-            if temp is not None:
-                for crop in s_crops:
-                    if crop in m_prices:
-                        price = m_prices[crop]
-                        if temp > 20 and price > 0.5:
-                            recs.append(crop)
+            windows = []
+            forecast = weather_client.get("forecast", city)
+            if forecast is not None:
+                windows = current_harvest_optimizer().plan(crop_registry.ids_of(s_crops), DailyForecast.from_payload(forecast))
+            recs = [w["crop"] for w in windows if w["score"] >= HARVEST_MIN_SCORE]
             if recs:
-                rec_text = "Optimal harvest time for: " + ", ".join(recs)
+                rec_text = "Best harvest windows in the forecast for: " + ", ".join(recs)
+            elif forecast is None:
+                rec_text = "The weather forecast is unavailable, so harvest windows could not be planned."
             else:
                 rec_text = "Conditions are not optimal for harvest of your suggested crops."
             extra_info = {
@@ -441,14 +687,15 @@ def feature_details(name):
                 "city": city,
                 "temperature": temp,
                 "weather_description": w_desc,
-                "recommended_crops": recs
+                "recommended_crops": recs,
+                "harvest_windows": windows
             }
         else:
             extra_info = {"harvest_recommendation": "No personalized crop suggestions available. Please submit your farm data."}
     elif feature['name'] == "AI-Based Yield Prediction":
         prediction = None
         prefill = {}
-        latest = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+        latest = latest_submission()
         if latest:
             prefill = {
                 "temperature": latest.temperature,
@@ -463,170 +710,421 @@ def feature_details(name):
             except (ValueError, TypeError):
                 prediction = "Invalid input. Please enter numeric values."
             else:
-                pred_df = pd.read_csv('data/predicted_yields.csv')
-                pred_df['distance'] = ((pred_df['temperature'] - temp_in) ** 2 +
-                                       (pred_df['rainfall'] - rain_in) ** 2 +
-                                       (pred_df['soil_ph'] - ph_in) ** 2) ** 0.5
-                best_row = pred_df.loc[pred_df['distance'].idxmin()]
-                yield_pred = best_row['predicted_yield']
+                yield_pred = predict_yield(temp_in, rain_in, ph_in)
                 prediction = f"Predicted crop yield: {yield_pred:.2f} units"
         extra_info = {"prefill": prefill, "prediction": prediction}
 
     if extra_info is None:
         extra_info = {}
     if "market_prices" not in extra_info:
-        extra_info["market_prices"] = default_market_prices
+        extra_info["market_prices"] = price_store.latest_prices()
 
-    print("Extra info for feature:", feature['name'], extra_info)
+    log.debug("feature=%r extra_info_keys=%s", feature['name'], sorted(extra_info))
     return render_template("feature.html", feature=feature, extra_info=extra_info)
 
-@app.route("/input", methods=["GET"])
 def input_form():
-    data = FarmData.query.filter_by(user_id=session.get('user_id')).order_by(FarmData.submitted_at.desc()).first()
+    data = latest_submission()
     return render_template("input_form.html", data=data)
 
-@app.route("/submit", methods=["POST"])
+def apply_recommendations(app, data_id, user_id, profile):
+    """Background job: scores a saved submission and stores its suggestions."""
+    suggestions = recommend(profile)
+    with app.app_context():
+        FarmData.query.filter_by(id=data_id).update({"suggestions": encode_suggestions(suggestions)})
+        with stage("db_commit"):
+            db.session.commit()
+    latest_cache.pop(user_id)
+    return suggestions
+
+def suggestion_status(data):
+    """'done', 'pending', 'failed' or 'missing' for a FarmData row's suggestions."""
+    if data.suggestions:
+        return "done"
+    if not current_app.config['ASYNC_RECOMMENDATIONS']:
+        return "missing"
+    jobs = current_app.extensions.get("recommendation_jobs")
+    if jobs is not None and jobs.error(data.id):
+        return "failed"
+    # Rows are only pending for a while; a job lost to a restart never finishes.
+    if datetime.utcnow() - data.submitted_at < timedelta(seconds=current_app.config['ASYNC_JOB_TIMEOUT']):
+        return "pending"
+    return "missing"
+
 def submit():
     user_id = session.get('user_id')
-    data = FarmData(
-        user_id=user_id,
-        soil_type=request.form.get("soil_type"),
-        soil_ph=float(request.form.get("soil_ph") or 6.5),
-        soil_moisture=float(request.form.get("soil_moisture") or 0),
-        temperature=float(request.form.get("temperature") or 0),
-        rainfall=float(request.form.get("rainfallAmount") or 0),
-        crop_history=request.form.get("crop_history"),
-        fertilizer_usage=request.form.get("fertilizer_usage"),
-        pest_issues=request.form.get("pest_issues"),
-        city=request.form.get("location")
-    )
-    db.session.add(data)
-    db.session.commit()
-    print("Data saved:", data)
+    profile = parse_profile(request.form)
+    jobs = current_app.extensions.get("recommendation_jobs")
+    data = farm_data_from_form(request.form, user_id)
+    if jobs is None:
+        with stage("reference_load"):
+            current_scorer()
+        finalSuggestions = recommend(profile)
+        log.debug("submit user=%s suggestions=%s", user_id, finalSuggestions)
+        data.suggestions = encode_suggestions(finalSuggestions)
+        session["personalized_suggestions"] = finalSuggestions
 
-    timeToSowAndHarvest = pd.read_excel('data/timeToSowAndHarvest.xlsx', engine='openpyxl')
-    waterToCrops = pd.read_excel('data/waterToCrops.xlsx', engine='openpyxl')
-    phToCrops = pd.read_excel('data/phToCrops.xlsx', engine='openpyxl')
-    nutrientsToCrops = pd.read_excel('data/nutrientsToCrops.xlsx', engine='openpyxl')
-    cropRotationCycle = pd.read_excel('data/cropRotationCycle.xlsx', engine='openpyxl')
-    
-    wantedSow = request.form.get("wantedSow")
-    wantedHarvest = request.form.get("wantedHarvest")
-    soilPh = float(request.form.get("soil_ph") or 6.5)
-    weather_input = float(request.form.get("weather"))
-    previousPlantsInput = request.form.get("previousPlants")
-    previousPlants = previousPlantsInput.split(", ") if previousPlantsInput else []
-    soilNit = int(request.form.get("soilNit"))
-    soilPho = int(request.form.get("soilPho"))
-    soilPot = int(request.form.get("soilPot"))
-    waterLevel = int(request.form.get("waterLevel"))
-    rainfall_input = request.form.get("rainfall")
-    irrigated_input = request.form.get("irrigated")
-    groundwater_input = request.form.get("groundwater")
-    surfacewater_input = request.form.get("surfacewater")
-
-    rainfall_bool = True if rainfall_input.lower() == "yes" else False
-    irrigated = True if irrigated_input.lower() == "yes" else False
-    groundwater = True if groundwater_input.lower() == "yes" else False
-    surfacewater = True if surfacewater_input.lower() == "yes" else False
-
-    plantPoints = {
-        "Peas": 0, "Fava Beans": 0, "Onions": 0, "Leeks": 0, "Garlic": 0,
-        "Greens (Collards, Kale, Mustard)": 0, "Turnips": 0, "White Potatoes": 0,
-        "Cabbage": 0, "Lettuce": 0, "Radishes": 0, "Beets": 0, "Carrots": 0,
-        "Shallots": 0, "Spinach": 0, "Bok Choy": 0, "Parsley": 0, "Swiss Chard": 0,
-        "Celery": 0, "Watermelons": 0, "Winter Squash": 0, "Melons": 0,
-        "Summer Squash": 0, "Cucumbers": 0, "Pumpkins": 0, "Sweet Potatoes": 0,
-        "Okra": 0, "Chinese Cabbage": 0, "Sweet Corn": 0, "Peanuts": 0,
-        "Lima Beans": 0, "Beans (Bush, Pole, Shell, Dried)": 0, "Black-Eyed Peas": 0,
-        "Eggplant": 0, "Peppers": 0, "Tomato": 0, "Basil": 0, "Gandules (Pigeon Peas)": 0
-    }
-
-    phCrops = phToCrops[(phToCrops["Low pH Acceptable"] <= soilPh) & (phToCrops["High pH Acceptable"] >= soilPh)]
-    for crop in phCrops['Crop'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 8
-
-    nitCrops = nutrientsToCrops[(nutrientsToCrops["Nitrogen (N) Low"] <= soilNit) & (nutrientsToCrops["Nitrogen (N) High"] >= soilNit)]
-    phoCrops = nutrientsToCrops[(nutrientsToCrops["Phosphorus (P) Low"] <= soilPho) & (nutrientsToCrops["Phosphorus (P) High"] >= soilPho)]
-    potCrops = nutrientsToCrops[(nutrientsToCrops["Potassium (K) Low"] <= soilPot) & (nutrientsToCrops["Potassium (K) High"] >= soilPot)]
-    for crop in nitCrops['Crop'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 10
-    for crop in phoCrops['Crop'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 9
-    for crop in potCrops['Crop'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 9
-
-    waterAmountCrops = waterToCrops[(waterToCrops["Min Water (mm)"] <= waterLevel) & (waterToCrops["Max Water (mm)"] >= waterLevel)]
-    for crop in waterAmountCrops['Crop'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 10
-
-    rainTypeCrops = pd.concat([
-        waterToCrops[waterToCrops["Rainfall"] == True] if rainfall_bool else pd.DataFrame(),
-        waterToCrops[waterToCrops["Irrigated"] == True] if irrigated else pd.DataFrame(),
-        waterToCrops[waterToCrops["Groundwater"] == True] if groundwater else pd.DataFrame(),
-        waterToCrops[waterToCrops["Surface Water"] == True] if surfacewater else pd.DataFrame()
-    ])
-    rainTypeCrops = rainTypeCrops.drop_duplicates()
-    for crop in rainTypeCrops['Crop'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 7
-
-    listOfSow = wantedSow.split(", ")
-    sowTimeCrops = pd.DataFrame()
-    for sow in listOfSow:
-        tempDF = timeToSowAndHarvest[timeToSowAndHarvest["Sowing Time"].str.contains(sow, case=False)]
-        sowTimeCrops = pd.concat([sowTimeCrops, tempDF])
-    sowTimeCrops = sowTimeCrops.drop_duplicates()
-    for crop in sowTimeCrops['Crop Name'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 8
-
-    listOfHarvest = wantedHarvest.split(", ")
-    harvestTimeCrops = pd.DataFrame()
-    for harv in listOfHarvest:
-        tempDF = timeToSowAndHarvest[timeToSowAndHarvest["Harvest Time"].str.contains(harv, case=False)]
-        harvestTimeCrops = pd.concat([harvestTimeCrops, tempDF])
-    harvestTimeCrops = harvestTimeCrops.drop_duplicates()
-    for crop in harvestTimeCrops['Crop Name'].tolist():
-        if crop in plantPoints:
-            plantPoints[crop] += 7
-
-    cropRotationCycleCropsTemp = []
-    for plant in previousPlants:
-        df_temp = cropRotationCycle[cropRotationCycle["Crops to Plant"].str.contains(plant, case=False)]
-        if not df_temp.empty:
-            cropRotationCycleCropsTemp.append(df_temp.iloc[0, 0])
-    counts = {"Year 1": 0, "Year 2": 0, "Year 3": 0, "Year 4": 0}
-    for year in cropRotationCycleCropsTemp:
-        if year in counts:
-            counts[year] += 1
-    if counts:
-        max_year = max(counts, key=counts.get)
-        selected_row = cropRotationCycle[cropRotationCycle["Year"] == max_year]
-        if not selected_row.empty:
-            crops_list = selected_row.iloc[0]["Crops to Plant"].split(", ")
-            for crop in crops_list:
-                if crop in plantPoints:
-                    plantPoints[crop] += 10
-
-    sortedCrops = sorted(plantPoints.items(), key=lambda item: item[1], reverse=True)
-    finalSuggestions = [crop for crop, pts in sortedCrops][:7]
-    print("Final Crop Suggestions:", finalSuggestions)
-    data.suggestions = ",".join(finalSuggestions)
-    db.session.commit()
-    session["personalized_suggestions"] = finalSuggestions
+    # The row and its suggestions go to the database in a single transaction;
+    # in async mode the suggestions are filled in by a job once it has an id.
+    committer = current_app.extensions.get("group_committer")
+    with stage("db_commit"):
+        if committer is not None:
+            data.id = committer.insert(row_values(data))
+        else:
+            db.session.add(data)
+            db.session.commit()
+    log.debug("submit saved id=%s user=%s", data.id, user_id)
+    invalidate_latest_submission(user_id)
+    if jobs is not None:
+        jobs.submit(data.id, apply_recommendations, current_app._get_current_object(), data.id, user_id, profile)
     return redirect(url_for('feature_details', name="Crop Recommendation"))
 
-@app.route("/submission/<int:data_id>")
+def request_body():
+    """The request body as a buffered stream, for reading line by line.
+
+    request.stream is unbuffered, so iterating its lines reads a byte at a time.
+    """
+    return io.BufferedReader(request.stream, 64 * 1024)
+
+def batch_recommendations():
+    persist = request.args.get("persist", "").lower() in ("1", "true", "yes")
+    user_id = session.get('user_id')
+    if request.mimetype in JSONL_MIMETYPES:
+        on_batch = (lambda chunk, results: persist_recommendations(chunk, results, user_id)) if persist else None
+        results = stream_recommendations(iter_jsonl(request_body()), on_batch=on_batch)
+        lines = (json.dumps(result) + "\n" for result in results)
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+    payload = request.get_json(silent=True)
+    profiles = payload.get("profiles") if isinstance(payload, dict) else payload
+    if not isinstance(profiles, list):
+        return jsonify({"error": "Expected a JSON list of profiles or {\"profiles\": [...]}"}), 400
+    limit = current_app.config['BATCH_JSON_MAX_PROFILES']
+    if len(profiles) > limit:
+        return jsonify({"error": f"At most {limit} profiles per JSON request; stream larger batches as JSONL"}), 413
+    on_batch = (lambda chunk, results: persist_recommendations(chunk, results, user_id)) if persist else None
+    # Scored BATCH_SIZE profiles at a time, like the JSONL path, so the criteria matrix stays small.
+    return jsonify({"results": list(stream_recommendations(profiles, on_batch=on_batch))})
+
+def observations():
+    if request.mimetype in JSONL_MIMETYPES:
+        fmt = "jsonl"
+    elif request.mimetype in CSV_MIMETYPES:
+        fmt = "csv"
+    else:
+        return jsonify({"error": "Send text/csv or application/x-ndjson"}), 415
+    default_user = request.args.get("user_id") or session.get('user_id')
+    chunk_size = request.args.get("chunk_size", INGEST_CHUNK_SIZE, type=int)
+    return jsonify(ingest_observations(request_body(), fmt, default_user, max(1, chunk_size)))
+
+@click.command("ingest")
+@click.argument("source", type=click.File("rb"), default="-")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Default: from the file extension.")
+@click.option("--user", "default_user", help="user_id for readings that don't name one.")
+@click.option("--chunk-size", default=INGEST_CHUNK_SIZE, show_default=True)
+@with_appcontext
+def ingest_command(source, fmt, default_user, chunk_size):
+    """Load sensor readings (soil_ph, soil_moisture, temperature, rainfall) from CSV or JSONL."""
+    fmt = fmt or ("csv" if source.name.lower().endswith(".csv") else "jsonl")
+    report = ingest_observations(source, fmt, default_user, chunk_size)
+    for error in report["errors"]:
+        click.echo(f"record {error['record']}: {error['error']}", err=True)
+    click.echo(f"{report['accepted']} stored, {report['rejected']} rejected in {report['seconds']}s "
+               f"({report['rows_per_second']} rows/s)")
+
+def latest_submissions(batch_size=1000):
+    """(id, user_id, city, suggestions) of every user's newest submission, streamed."""
+    for rows in latest_row_chunks(("id", "user_id", "city", "suggestions"), batch_size):
+        for data_id, user_id, city, suggestions in rows:
+            yield data_id, user_id, city or DEFAULT_CITY, suggestions
+
+@click.command("plan-harvests")
+@click.option("--output", type=click.File("w"), default="-", help="JSONL destination; default stdout.")
+@click.option("--forecast-file", type=click.Path(exists=True, dir_okay=False),
+              help="A saved /forecast response to use for every city instead of calling the API.")
+@click.option("--window", default=HARVEST_WINDOW_DAYS, show_default=True, help="Harvest window length in days.")
+@with_appcontext
+def plan_harvests_command(output, forecast_file, window):
+    """Plan harvest windows for every user's latest suggestions (nightly batch)."""
+    fixed = DailyForecast.from_file(forecast_file) if forecast_file else None
+
+    def forecast_for(city):
+        if fixed is not None:
+            return fixed
+        payload = weather_client.get("forecast", city)
+        return DailyForecast.from_payload(payload) if payload is not None else None
+
+    start = time.perf_counter()
+    plans = failed = 0
+    for plan in plan_users(latest_submissions(), forecast_for, window=window):
+        output.write(json.dumps(plan) + "\n")
+        plans += 1
+        failed += "error" in plan
+    click.echo(f"{plans} plans ({failed} without a forecast) in {time.perf_counter() - start:.2f}s", err=True)
+
+@click.command("refresh-alerts")
+@click.option("--chunk-size", default=ALERT_CHUNK_SIZE, show_default=True, help="Users per batch; bounds memory.")
+@with_appcontext
+def refresh_alerts_command(chunk_size):
+    """Precompute soil, subsidy and weather alerts for every user's latest submission."""
+    report = refresh_alerts(max(1, chunk_size))
+    click.echo(f"{report['alerts']} alerts for {report['users']} users in {report['chunks']} chunks, "
+               f"{report['seconds']}s ({report['users_per_second']} users/s{peak_rss_note()})")
+
+def peak_rss_note():
+    """", peak RSS N MB" for this process, or "" where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return ""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux.
+    peak_bytes = peak if sys.platform == "darwin" else peak * 1024
+    return f", peak RSS {peak_bytes / (1024 * 1024):.0f} MB"
+
+@click.command("recommend")
+@click.argument("source", type=click.File("r"), default="-")
+@click.option("--persist", is_flag=True, help="Save each scored profile as a FarmData row.")
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+@with_appcontext
+def recommend_command(source, persist, batch_size):
+    """Score farm profiles from a JSON array or JSONL file and print JSONL results."""
+    first = source.readline()
+    if first.lstrip().startswith("["):
+        profiles = json.loads(first + source.read())
+    else:
+        profiles = iter_jsonl(itertools.chain([first], source))
+    on_batch = persist_recommendations if persist else None
+    for result in stream_recommendations(profiles, batch_size=batch_size, on_batch=on_batch):
+        click.echo(json.dumps(result))
+
+def responsive_image(filename):
+    """src, size and <source> srcsets for a static image, for a <picture> element.
+
+    Falls back to the original file alone when build-images hasn't been run.
+    """
+    image = {"src": url_for('static', filename=filename), "width": None, "height": None, "sources": []}
+    entry = image_manifest.get(filename)
+    if entry:
+        image["width"], image["height"] = entry["width"], entry["height"]
+        for fmt, variants in entry["variants"].items():
+            srcset = ", ".join(f"{url_for('image_variant', filename=v['file'])} {v['width']}w" for v in variants)
+            image["sources"].append({"type": FORMATS[fmt]["mime"], "srcset": srcset})
+    return image
+
+def image_variant(filename):
+    response = send_from_directory(BUILD_DIR, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@click.command("build-images")
+def build_images_command():
+    """Generate resized WebP/AVIF variants of static/images (needs Pillow)."""
+    try:
+        manifest = build_images()
+    except ImportError:
+        raise click.ClickException("Pillow is required: pip install Pillow")
+    count = sum(len(v) for entry in manifest.values() for v in entry["variants"].values())
+    click.echo(f"{count} variants of {len(manifest)} images in {BUILD_DIR}")
+
+def prometheus_metrics():
+    return Response(registry.render(), mimetype=CONTENT_TYPE)
+
+def reference_data_stats():
+    return jsonify(reference_store.stats())
+
+def price_stats():
+    return jsonify(price_store.stats())
+
+def price_history(crop):
+    crop_id = crop_registry.id_of(crop)
+    if crop_id is None:
+        return jsonify({"error": f"Unknown crop: {crop}"}), 404
+    since = request.args.get("since")
+    try:
+        since = datetime.strptime(since, "%Y-%m-%d").date() if since else None
+    except ValueError:
+        return jsonify({"error": "since must be YYYY-MM-DD"}), 400
+    history = price_store.history(crop_id, since)
+    return jsonify({
+        "crop": crop_registry.name_of(crop_id),
+        "crop_id": crop_id,
+        "latest": price_store.latest(crop_id),
+        "history": [{"date": day.isoformat(), "price": price} for day, price in history],
+    })
+
+@click.command("record-price")
+@click.argument("crop")
+@click.argument("price", type=float)
+@click.option("--date", "day", type=click.DateTime(["%Y-%m-%d"]), help="Default: today.")
+def record_price_command(crop, price, day):
+    """Add a dated market price for a crop to data/market_prices.csv."""
+    day = day.date() if day else date.today()
+    try:
+        crop_id = price_store.record(crop, price, day)
+    except (KeyError, ValueError) as exc:
+        raise click.ClickException(exc.args[0])
+    click.echo(f"{crop_registry.name_of(crop_id)}: ${price:.2f} on {day.isoformat()}")
+
+def memory_stats():
+    try:
+        memory = process_memory()
+    except OSError:
+        memory = None
+    state = current_app.extensions["startup"]
+    return jsonify({"pid": os.getpid(), "fork_preload": current_app.config['FORK_PRELOAD'],
+                    "shared_bytes": state.get("shared_bytes"), "memory": memory})
+
+def weather_stats():
+    prefetcher = current_app.extensions["weather_prefetcher"]
+    return jsonify({"client": weather_client.stats, "prefetcher": prefetcher.status()})
+
+def recommendation_status(data_id):
+    data = db.session.get(FarmData, data_id)
+    if data is None:
+        return jsonify({"id": data_id, "status": "missing"}), 404
+    status = suggestion_status(data)
+    body = {"id": data_id, "status": status}
+    if status == "done":
+        body["suggestions"] = decode_suggestions(data.suggestions)
+    return jsonify(body)
+
+def page_cache_stats():
+    return jsonify(page_cache.stats())
+
+def recommendation_cache_stats():
+    return jsonify(recommendation_cache.stats())
+
+def job_stats():
+    jobs = current_app.extensions.get("recommendation_jobs")
+    committer = current_app.extensions.get("group_committer")
+    return jsonify({"enabled": jobs is not None, "recommendations": jobs.stats() if jobs else None,
+                    "group_commit": committer.stats() if committer else None})
+
 def submission(data_id):
     data = FarmData.query.get_or_404(data_id)
     return render_template("submission.html", data=data)
 
+def readiness():
+    state = current_app.extensions["startup"]
+    return jsonify(state), (200 if state["ready"] else 503)
+
+def register_routes(app):
+    app.before_request(before_request)
+    app.after_request(record_request_metrics)
+    app.add_url_rule("/", view_func=home)
+    app.add_url_rule("/feature/<name>", view_func=feature_details, methods=["GET", "POST"])
+    app.add_url_rule("/input", view_func=input_form, methods=["GET"])
+    app.add_url_rule("/submit", view_func=submit, methods=["POST"])
+    app.add_url_rule("/submission/<int:data_id>", view_func=submission)
+    app.add_url_rule("/api/recommendations", view_func=batch_recommendations, methods=["POST"])
+    app.add_url_rule("/api/observations", view_func=observations, methods=["POST"])
+    app.add_url_rule("/api/recommendations/<int:data_id>", view_func=recommendation_status)
+    app.add_url_rule("/jobs/stats", view_func=job_stats)
+    app.add_url_rule("/page-cache/stats", view_func=page_cache_stats)
+    app.add_url_rule("/recommendation-cache/stats", view_func=recommendation_cache_stats)
+    app.add_url_rule("/images/<path:filename>", view_func=image_variant)
+    app.add_url_rule("/reference-data/stats", view_func=reference_data_stats)
+    app.add_url_rule("/market-prices/stats", view_func=price_stats)
+    app.add_url_rule("/api/prices/<crop>", view_func=price_history)
+    app.add_url_rule("/weather/stats", view_func=weather_stats)
+    app.add_url_rule("/ready", view_func=readiness)
+    app.add_url_rule("/memory/stats", view_func=memory_stats)
+    app.add_url_rule("/metrics", view_func=prometheus_metrics)
+    app.cli.add_command(upgrade_db_command)
+    app.cli.add_command(recommend_command)
+    app.cli.add_command(ingest_command)
+    app.cli.add_command(build_images_command)
+    app.cli.add_command(record_price_command)
+    app.cli.add_command(plan_harvests_command)
+    app.cli.add_command(refresh_alerts_command)
+    app.add_template_global(responsive_image)
+
+def startup(app):
+    """One-time warmup: schema, reference data, models and templates.
+
+    Runs once per process when the app is created, so steady-state requests
+    never touch the schema, openpyxl or the template compiler.
+    """
+    state = app.extensions["startup"]
+    start = time.perf_counter()
+    with app.app_context():
+        state["schema_version"] = upgrade_schema()
+    reference_store.preload()
+    price_store.index()
+    current_scorer()
+    current_harvest_optimizer()
+    model_registry.load()
+    current_yield_index()
+    current_yield_grid()
+    for name in PRELOADED_TEMPLATES:
+        app.jinja_env.get_template(name)
+    state["seconds"] = round(time.perf_counter() - start, 3)
+    state["ready"] = True
+
+def start_background(app):
+    """Starts the process's threads: group commit writer, job pool, weather prefetcher.
+
+    Threads don't survive fork, so under gunicorn's preload mode this runs
+    in each worker (see after_fork) instead of in the master.
+    """
+    if app.config['SUBMIT_GROUP_COMMIT']:
+        with app.app_context():
+            app.extensions["group_committer"] = GroupCommitter(
+                db.engine, FarmData.__table__,
+                max_batch=app.config['GROUP_COMMIT_MAX_BATCH'],
+                max_delay=app.config['GROUP_COMMIT_MAX_DELAY'],
+            )
+    if app.config['ASYNC_RECOMMENDATIONS']:
+        app.extensions["recommendation_jobs"] = JobQueue(app.config['ASYNC_JOB_WORKERS'], name="recommend")
+    if app.config['WEATHER_PREFETCH'] and app.config['STARTUP_WARMUP']:
+        app.extensions["weather_prefetcher"].start()
+
+def after_fork(app):
+    """gunicorn post_fork hook for a preloaded app: per-worker connections and threads."""
+    with app.app_context():
+        # SQLite connections opened by the master's warmup must not be shared.
+        db.engine.dispose(close=False)
+    start_background(app)
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('SECRET_KEY', 'a_default_secret_key')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///farmdata.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['WEATHER_PREFETCH'] = os.environ.get("WEATHER_PREFETCH", "").lower() in ("1", "true", "yes")
+    app.config['SQLITE_PRAGMAS'] = dict(SQLITE_PRAGMAS)
+    app.config['SUBMIT_GROUP_COMMIT'] = os.environ.get("SUBMIT_GROUP_COMMIT", "").lower() in ("1", "true", "yes")
+    app.config['GROUP_COMMIT_MAX_BATCH'] = GROUP_COMMIT_MAX_BATCH
+    app.config['GROUP_COMMIT_MAX_DELAY'] = GROUP_COMMIT_MAX_DELAY
+    app.config['ASYNC_RECOMMENDATIONS'] = os.environ.get("ASYNC_RECOMMENDATIONS", "").lower() in ("1", "true", "yes")
+    app.config['ASYNC_JOB_WORKERS'] = int(os.environ.get("ASYNC_JOB_WORKERS", JOB_WORKERS))
+    app.config['ASYNC_JOB_TIMEOUT'] = 60
+    app.config['BATCH_JSON_MAX_PROFILES'] = int(os.environ.get("BATCH_JSON_MAX_PROFILES", 10000))
+    app.config['STARTUP_WARMUP'] = True
+    # Set by gunicorn.conf.py when the app is loaded in the master before fork.
+    app.config['FORK_PRELOAD'] = os.environ.get("FORK_PRELOAD", "").lower() in ("1", "true", "yes")
+    app.config['LOG_LEVEL'] = os.environ.get("LOG_LEVEL", "INFO").upper()
+    if config:
+        app.config.update(config)
+    logging.basicConfig(level=app.config['LOG_LEVEL'], format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+        event.listen(db.engine, "before_cursor_execute", count_query)
+    app.extensions["startup"] = {"ready": False}
+    app.extensions["weather_prefetcher"] = WeatherPrefetcher(weather_client, lambda: active_cities(app))
+    register_routes(app)
+    if app.config['STARTUP_WARMUP']:
+        startup(app)
+    if app.config['FORK_PRELOAD']:
+        if app.config['STARTUP_WARMUP']:
+            app.extensions["startup"]["shared_bytes"] = share_reference_data()
+    else:
+        start_background(app)
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
     app.run(debug=True)
     
\ No newline at end of file
@@ -0,0 +1,66 @@
+import itertools
+import json
+
+from scoring import current_scorer, parse_profile
+
+BATCH_SIZE = 1000
+JSONL_MIMETYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+def iter_jsonl(lines):
+    """Yields one profile per non-blank line; malformed lines yield the ValueError."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield exc
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def recommend_batch(raw_profiles, start=0, scorer=None):
+    """Scores a list of raw profiles in one vectorized pass.
+
+    Each result carries the profile's position in the overall input and
+    either its top-7 ``suggestions`` or an ``error``; a bad profile never
+    fails the rest of the batch.
+    """
+    scorer = scorer or current_scorer()
+    results = [None] * len(raw_profiles)
+    parsed, positions = [], []
+    for i, raw in enumerate(raw_profiles):
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            if not isinstance(raw, dict):
+                raise ValueError("profile must be a JSON object")
+            parsed.append(parse_profile(raw))
+            positions.append(i)
+        except (TypeError, ValueError) as exc:
+            results[i] = {"index": start + i, "error": str(exc)}
+    for i, suggestions in zip(positions, scorer.recommend_many(parsed)):
+        results[i] = {"index": start + i, "suggestions": suggestions}
+    return results
+
+
+def stream_recommendations(raw_profiles, batch_size=BATCH_SIZE, on_batch=None):
+    """Lazily scores an iterable of raw profiles, batch_size at a time."""
+    start = 0
+    for chunk in chunked(raw_profiles, batch_size):
+        results = recommend_batch(chunk, start=start)
+        if on_batch is not None:
+            on_batch(chunk, results)
+        yield from results
+        start += len(chunk)
@@ -0,0 +1,298 @@
+"""Latency and throughput of /input, /submit and every /feature/<name> page.
+
+A seeded population of --users synthetic farmers each keeps a session
+and a farm profile. Every iteration a user opens /input, posts /submit
+with a slightly varied form, then views all nine feature pages. Weather
+calls go to a local stub (weather_stub.py), so the run is offline and
+repeatable. Modes:
+
+    inprocess  Flask test client in this process, --concurrency threads
+    gunicorn   a real gunicorn with --workers workers, driven over HTTP
+
+Results per endpoint (count, errors, requests/s, mean/p50/p95/p99 ms) are
+printed and, with --json, saved for later comparison with --baseline:
+
+    python benchmarks/bench_app.py --modes inprocess gunicorn --workers 4 --json after.json
+    python benchmarks/bench_app.py --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scoring import CROPS  # noqa: E402
+from seasons import MONTHS  # noqa: E402
+from weather_stub import WeatherStub  # noqa: E402
+
+MODES = ("inprocess", "gunicorn")
+FEATURES = (
+    "Crop Recommendation", "Government Aid & Subsidy Info", "Soil Health Monitoring",
+    "Market Price Alerts", "Crop Rotation Planning", "Real-Time Weather",
+    "Fertilizer & Water Usage Recommendations", "Harvest Optimization", "AI-Based Yield Prediction",
+)
+CITIES = ("Chester Springs", "Lancaster", "York", "Gettysburg", "Harrisburg", "Reading", "Allentown", "Erie")
+SOIL_TYPES = ("Sandy", "Loamy", "Clay")
+
+
+def make_farm(rng):
+    """One synthetic farm: the fields a user fills in on /input."""
+    sources = {field: rng.choice(("Yes", "No")) for field in ("rainfall", "irrigated", "groundwater", "surfacewater")}
+    if "Yes" not in sources.values():
+        sources["rainfall"] = "Yes"
+    history = ", ".join(rng.sample(CROPS, rng.randint(0, 3)))
+    return {
+        "location": rng.choice(CITIES),
+        "soil_type": rng.choice(SOIL_TYPES),
+        "soil_ph": f"{rng.uniform(5.0, 7.8):.1f}",
+        "soil_moisture": str(rng.randint(10, 60)),
+        "temperature": str(rng.randint(45, 90)),
+        "rainfallAmount": str(rng.randint(10, 60)),
+        "weather": str(rng.randint(40, 90)),
+        "soilNit": str(rng.randint(10, 250)),
+        "soilPho": str(rng.randint(5, 120)),
+        "soilPot": str(rng.randint(20, 250)),
+        "waterLevel": str(rng.randint(200, 800)),
+        "wantedSow": ", ".join(rng.sample(MONTHS, rng.randint(1, 3))),
+        "wantedHarvest": ", ".join(rng.sample(MONTHS, rng.randint(1, 3))),
+        "previousPlants": history,
+        "crop_history": history,
+        "fertilizer_usage": rng.choice(("", "Compost", "NPK 10-10-10")),
+        "pest_issues": rng.choice(("", "Aphids", "Beetles")),
+        **sources,
+    }
+
+
+def resubmission(farm, rng):
+    """The same farm a season later: soil test values drift a little."""
+    form = dict(farm)
+    for field, spread in (("soilNit", 15), ("soilPho", 8), ("soilPot", 15), ("soil_moisture", 5)):
+        form[field] = str(max(0, int(farm[field]) + rng.randint(-spread, spread)))
+    form["soil_ph"] = f"{min(8.5, max(4.5, float(farm['soil_ph']) + rng.uniform(-0.2, 0.2))):.1f}"
+    return form
+
+
+def user_session(farm, iterations, seed):
+    """Yields (label, method, path, form) for one user's visits."""
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        yield "/input", "GET", "/input", None
+        yield "/submit", "POST", "/submit", resubmission(farm, rng)
+        for name in FEATURES:
+            yield f"/feature/{name}", "GET", f"/feature/{quote(name)}", None
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def call(method, path, form):
+            response = client.open(path, method=method, data=form)
+            response.close()
+            return response.status_code
+        return call
+
+
+class HTTPDriver:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def session(self):
+        http = requests.Session()
+
+        def call(method, path, form):
+            response = http.request(method, self.base_url + path, data=form, allow_redirects=False, timeout=30)
+            return response.status_code
+        return call
+
+
+def drive(driver, farms, iterations, concurrency, seed):
+    samples = {}
+    lock = threading.Lock()
+
+    def run_user(index):
+        call = driver.session()
+        local = []
+        for label, method, path, form in user_session(farms[index], iterations, seed + index):
+            start = time.perf_counter()
+            try:
+                ok = call(method, path, form) < 400
+            except requests.RequestException:
+                ok = False
+            local.append((label, time.perf_counter() - start, ok))
+        with lock:
+            for label, seconds, ok in local:
+                samples.setdefault(label, []).append((seconds, ok))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run_user, range(len(farms))))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for label in sorted(samples):
+        seconds = np.array([s for s, _ in samples[label]]) * 1000
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+        endpoints[label] = {
+            "count": len(seconds),
+            "errors": sum(not ok for _, ok in samples[label]),
+            "requests_per_second": round(len(seconds) / elapsed, 1),
+            "mean_ms": round(float(seconds.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "seconds": round(elapsed, 3),
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "requests_per_second": round(total / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_inprocess(args, farms, env):
+    # weather.py and create_app() read their settings at import time.
+    os.environ.update(env)
+    import app as app_module
+
+    driver = TestClientDriver(app_module.app)
+    drive(driver, farms[:max(1, len(farms) // 10)], args.warmup, args.concurrency, args.seed + 10_000)
+    return drive(driver, farms, args.iterations, args.concurrency, args.seed)
+
+
+def run_gunicorn(args, farms, env):
+    port = free_port()
+    command = [sys.executable, "-m", "gunicorn", "--workers", str(args.workers), "--threads", str(args.threads),
+               "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "app:app"]
+    server = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **env})
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if requests.get(base_url + "/ready", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise SystemExit("gunicorn did not become ready")
+            time.sleep(0.2)
+        driver = HTTPDriver(base_url)
+        drive(driver, farms[:max(1, len(farms) // 10)], args.warmup, args.concurrency, args.seed + 10_000)
+        return drive(driver, farms, args.iterations, args.concurrency, args.seed)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(run, baseline=None):
+    title = run["mode"] + (f" ({run['workers']} workers)" if run["mode"] == "gunicorn" else "")
+    print(f"\n{title}: {run['requests']} requests in {run['seconds']}s, "
+          f"{run['requests_per_second']} req/s, {run['errors']} errors")
+    print(f"{'endpoint':<50} {'count':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, e in run["endpoints"].items():
+        line = f"{label:<50} {e['count']:>6} {e['requests_per_second']:>8} {e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8}"
+        old = (baseline or {}).get(label)
+        if old:
+            line += f"  p50 {e['p50_ms'] - old['p50_ms']:+.2f}  p95 {e['p95_ms'] - old['p95_ms']:+.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["inprocess"])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5, help="visits per user")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed visits by a tenth of the users first")
+    parser.add_argument("--concurrency", type=int, default=8, help="users driven at once")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument("--weather-delay", type=float, default=0.05, help="stub upstream latency, seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra app setting, e.g. ASYNC_RECOMMENDATIONS=1; repeatable")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    farms = [make_farm(rng) for _ in range(args.users)]
+    stub = WeatherStub(delay=args.weather_delay).start()
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["mode"], r.get("workers")): r["endpoints"] for r in json.load(f)["runs"]}
+
+    runs = []
+    try:
+        for mode in args.modes:
+            # A fresh database per mode, outside the repo's instance folder.
+            scratch = tempfile.mkdtemp(prefix="farmer-bench-")
+            env = {
+                "DATABASE_URL": f"sqlite:///{os.path.join(scratch, 'bench.db')}",
+                "OPENWEATHER_BASE_URL": stub.url,
+                "LOG_LEVEL": "WARNING",
+                **dict(item.split("=", 1) for item in args.env),
+            }
+            runner = run_inprocess if mode == "inprocess" else run_gunicorn
+            samples, elapsed = runner(args, farms, env)
+            run = {"mode": mode, "workers": args.workers if mode == "gunicorn" else None, **summarize(samples, elapsed)}
+            runs.append(run)
+            print_run(run, baseline.get((mode, run["workers"])))
+    finally:
+        stub.stop()
+
+    if args.json:
+        result = {
+            "config": vars(args),
+            "environment": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "runs": runs,
+        }
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Per-worker memory of gunicorn with and without the preloaded, shared reference data.
+
+Starts gunicorn once per mode with --workers workers (gunicorn.conf.py
+from the repo root is used, as in production):
+
+    fork      GUNICORN_PRELOAD=0: every worker imports and warms up the app
+    preload   the master warms up, shares the reference arrays, then forks
+
+Each run sends --requests requests across every page, spread over the
+workers, then reads RSS, PSS and USS of the master and every worker from
+/proc/<pid>/smaps_rollup (Linux only). PSS is the number to budget with:
+shared pages are split between the processes that map them, so the sum
+over workers is what the workers really cost.
+
+    python benchmarks/bench_memory.py --workers 8 --json memory.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_app import FEATURES, free_port  # noqa: E402
+from weather_stub import WeatherStub  # noqa: E402
+
+MODES = ("fork", "preload")
+MB = 1024 * 1024
+
+
+def process_memory(pid):
+    # Same fields as preload.process_memory, without importing the app here.
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def children(pid):
+    out = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout
+    return [int(p) for p in out.split()]
+
+
+def wait_ready(base_url, server, workers, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("gunicorn exited during startup")
+        try:
+            if requests.get(base_url + "/ready", timeout=1).status_code == 200 and len(children(server.pid)) >= workers:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("gunicorn did not become ready")
+
+
+def exercise(base_url, count):
+    paths = ["/", "/input"] + [f"/feature/{quote(name)}" for name in FEATURES]
+    # A new connection per request, so gunicorn spreads them over the workers.
+    for i in range(count):
+        requests.get(base_url + paths[i % len(paths)], timeout=30)
+
+
+def run(mode, args, env):
+    port = free_port()
+    command = [sys.executable, "-m", "gunicorn", "--workers", str(args.workers), "--bind", f"127.0.0.1:{port}",
+               "--log-level", "warning", "app:app"]
+    env = {**os.environ, **env, "GUNICORN_PRELOAD": "1" if mode == "preload" else "0"}
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url, server, args.workers)
+        exercise(base_url, args.requests)
+        time.sleep(args.settle)
+        workers = [process_memory(pid) for pid in children(server.pid)]
+        master = process_memory(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    total_pss = master["pss"] + sum(w["pss"] for w in workers)
+    mean = {key: sum(w[key] for w in workers) / len(workers) for key in ("rss", "pss", "uss")}
+    return {
+        "mode": mode,
+        "workers": len(workers),
+        "master": master,
+        "per_worker": workers,
+        "mean_worker": mean,
+        "total_pss": total_pss,
+        # How many workers fit in --budget-mb once the master is paid for.
+        "workers_in_budget": int((args.budget_mb * MB - master["pss"]) // mean["pss"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=500, help="page requests before measuring")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait before reading memory")
+    parser.add_argument("--budget-mb", type=int, default=1024, help="memory budget for the workers-per-box estimate")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("needs Linux /proc/<pid>/smaps_rollup")
+
+    stub = WeatherStub().start()
+    runs = []
+    try:
+        for mode in args.modes:
+            scratch = tempfile.mkdtemp(prefix="farmer-memory-")
+            env = {"DATABASE_URL": f"sqlite:///{os.path.join(scratch, 'bench.db')}",
+                   "OPENWEATHER_BASE_URL": stub.url, "LOG_LEVEL": "WARNING"}
+            runs.append(run(mode, args, env))
+    finally:
+        stub.stop()
+
+    print(f"{'mode':<8} {'worker RSS':>11} {'worker PSS':>11} {'worker USS':>11} {'master PSS':>11} "
+          f"{'total PSS':>10} {'workers/' + str(args.budget_mb) + 'MB':>14}")
+    for r in runs:
+        m = r["mean_worker"]
+        print(f"{r['mode']:<8} {m['rss'] / MB:>10.1f}M {m['pss'] / MB:>10.1f}M {m['uss'] / MB:>10.1f}M "
+              f"{r['master']['pss'] / MB:>10.1f}M {r['total_pss'] / MB:>9.1f}M {r['workers_in_budget']:>14}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Read-path latency as the farmdata table grows, with a slow-query check.
+
+Grows one SQLite database through each --scales size with
+generate_farmdata.py. At each size, real users from the table are
+replayed against home, input_form, every /feature/<name> page and
+submission/<id>, and the weather prefetcher's active-city query is run
+too. Page caching is off and weather comes from a local stub, so only the
+database and rendering are measured.
+
+Each distinct SQL statement is timed and run through EXPLAIN QUERY PLAN.
+A statement that scans the whole farmdata table, or that takes over
+--slow-ms at any scale, is reported, and the exit status is 1 so the
+check can gate a change:
+
+    python benchmarks/bench_scale.py --scales 10000 100000 1000000 --users 200000 --json scale.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_farmdata import load, row_count  # noqa: E402
+from weather_stub import WeatherStub  # noqa: E402
+
+
+def percentiles(seconds):
+    ms = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": len(ms), "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3), "max_ms": round(float(ms.max()), 3)}
+
+
+class QueryRecorder:
+    """Collects each distinct statement the engine runs, with sample parameters."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.statements = {}
+        event.listen(engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        entry = self.statements.setdefault(statement, [parameters, 0])
+        entry[1] += 1
+
+    def reset(self):
+        statements, self.statements = self.statements, {}
+        return statements
+
+
+def query_plan(engine, statement, params):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def replay(engine, statement, params, runs=5):
+    """Median time to execute and fetch a read statement, in seconds.
+
+    Cursor events only see the first step of a SQLite query; a scan mostly
+    runs while rows are fetched, so statements are timed again in full.
+    """
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    seconds = []
+    with engine.connect() as conn:
+        for _ in range(runs):
+            start = time.perf_counter()
+            conn.exec_driver_sql(statement, params).fetchall()
+            seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds))
+
+
+def full_scan(plan):
+    return any(step.startswith("SCAN farmdata") for step in plan)
+
+
+def measure(app_module, client, users, ids, samples, rng):
+    app = app_module.app
+    pages = {"home": "/", "input_form": "/input"}
+    for feature in app_module.features:
+        pages[f"feature: {feature['name']}"] = f"/feature/{quote(feature['name'])}"
+    results = {}
+    for label, path in pages.items():
+        seconds = []
+        for _ in range(samples):
+            with client.session_transaction() as session:
+                session["user_id"] = rng.choice(users)
+            start = time.perf_counter()
+            assert client.get(path).status_code == 200, path
+            seconds.append(time.perf_counter() - start)
+        results[label] = percentiles(seconds)
+    seconds = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        assert client.get(f"/submission/{rng.choice(ids)}").status_code == 200
+        seconds.append(time.perf_counter() - start)
+    results["submission"] = percentiles(seconds)
+    seconds = []
+    for _ in range(max(1, samples // 20)):
+        start = time.perf_counter()
+        app_module.active_cities(app)
+        seconds.append(time.perf_counter() - start)
+    results["active_cities (prefetch)"] = percentiles(seconds)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", help="SQLite file to grow; default a temporary one")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=200_000, help="distinct user_ids in the generated rows")
+    parser.add_argument("--samples", type=int, default=200, help="requests per page and scale")
+    parser.add_argument("--slow-ms", type=float, default=20.0, help="statement time that counts as slow")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.database or os.path.join(tempfile.mkdtemp(prefix="farmer-scale-"), "scale.db"))
+    stub = WeatherStub().start()
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{path}",
+        "OPENWEATHER_BASE_URL": stub.url,
+        "PAGE_CACHE_SIZE": "0",
+        "LATEST_SUBMISSION_CACHE_SIZE": "0",
+        "LOG_LEVEL": "WARNING",
+    })
+    # The first load creates the schema through the app.
+    load(path, min(args.scales), args.users, seed=args.seed, log=lambda line: None)
+    import app as app_module
+
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    recorder = QueryRecorder(engine)
+    client = app_module.app.test_client()
+    rng = random.Random(args.seed)
+    runs, problems = [], {}
+    try:
+        for scale in sorted(args.scales):
+            rate = load(path, scale, args.users, seed=args.seed, log=lambda line: None)
+            with engine.connect() as conn:
+                # Updates the planner statistics, as a long-running database would have.
+                conn.exec_driver_sql("ANALYZE")
+                picks = conn.exec_driver_sql(
+                    "SELECT id, user_id FROM farmdata WHERE id IN (%s)" % ",".join(
+                        str(rng.randint(1, scale)) for _ in range(500))).fetchall()
+            ids, users = [p[0] for p in picks], [p[1] for p in picks]
+            recorder.reset()
+            pages = measure(app_module, client, users, ids, args.samples, rng)
+            queries = []
+            for statement, (params, calls) in recorder.reset().items():
+                plan = query_plan(engine, statement, params)
+                seconds = replay(engine, statement, params)
+                stats = {"sql": " ".join(statement.split()), "calls": calls, "plan": plan,
+                         "ms": round(seconds * 1000, 3) if seconds is not None else None, "rows": scale}
+                queries.append(stats)
+                if full_scan(plan) or (stats["ms"] or 0) > args.slow_ms:
+                    problems[stats["sql"]] = stats
+            recorder.reset()
+            runs.append({"rows": row_count(path), "load_rows_per_second": round(rate) if rate else None,
+                         "pages": pages, "queries": queries})
+
+            print(f"\n{scale:,} rows")
+            print(f"{'page':<55} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            for label, p in pages.items():
+                print(f"{label:<55} {p['p50_ms']:>8} {p['p95_ms']:>8} {p['p99_ms']:>8}")
+    finally:
+        stub.stop()
+
+    if problems:
+        print("\nSlow or full-scan queries:")
+        for sql, stats in problems.items():
+            print(f"- {stats['ms']} ms at {stats['rows']:,} rows: {sql[:160]}")
+            for step in stats["plan"]:
+                print(f"    {step}")
+    else:
+        print("\nEvery statement used an index and stayed under the slow threshold.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "database": path, "runs": runs, "problems": list(problems.values())},
+                      f, indent=2)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Submits/second through the /submit write path, before and after WAL + group commit.
+
+Each mode runs against a fresh SQLite file with --processes worker processes
+(standing in for gunicorn workers), each running --threads threads that
+write --writes rows apiece:
+
+    legacy  rollback journal; insert + commit, then update suggestions + commit
+    wal     WAL pragmas; row and suggestions inserted in one transaction
+    group   WAL pragmas; rows queued through a GroupCommitter per process
+
+    python benchmarks/bench_submit_writes.py --processes 4 --threads 8 --writes 100
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from write_path import SQLITE_PRAGMAS, GroupCommitter, apply_sqlite_pragmas  # noqa: E402
+
+MODES = ("legacy", "wal", "group")
+SUGGESTIONS = '["Peas", "Fava Beans", "Lettuce", "Radishes", "Spinach", "Bok Choy", "Turnips"]'
+
+
+def farmdata_table():
+    # Imported lazily: importing app builds the default app, which is only
+    # wanted in the parent process after DATABASE_URL has been pointed away.
+    from app import FarmData
+    return FarmData.__table__
+
+
+def row(worker, n):
+    return {
+        "user_id": f"bench-{worker}-{n % 50}",
+        "soil_type": "Loamy",
+        "soil_ph": 6.5,
+        "soil_moisture": 30.0,
+        "temperature": 68.0,
+        "rainfall": 50.0,
+        "crop_history": "Peas, Turnips",
+        "city": "Chester Springs",
+        "submitted_at": datetime.utcnow(),
+    }
+
+
+def run_worker(mode, path, worker, threads, writes, results):
+    table = farmdata_table()
+    engine = create_engine(f"sqlite:///{path}")
+    if mode != "legacy":
+        apply_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    committer = GroupCommitter(engine, table) if mode == "group" else None
+    counts = {"ok": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def write(thread):
+        for n in range(writes):
+            values = row(f"{worker}.{thread}", n)
+            try:
+                if mode == "legacy":
+                    with engine.begin() as conn:
+                        row_id = conn.execute(insert(table).returning(table.c.id), values).scalar()
+                    with engine.begin() as conn:
+                        conn.execute(update(table).where(table.c.id == row_id).values(suggestions=SUGGESTIONS))
+                elif mode == "wal":
+                    with engine.begin() as conn:
+                        conn.execute(insert(table), dict(values, suggestions=SUGGESTIONS))
+                else:
+                    committer.insert(dict(values, suggestions=SUGGESTIONS))
+                key = "ok"
+            except OperationalError:
+                key = "locked"
+            with lock:
+                counts[key] += 1
+
+    pool = [threading.Thread(target=write, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put(counts)
+
+
+def run_mode(mode, processes, threads, writes):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        farmdata_table().metadata.create_all(engine)
+        engine.dispose()
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        procs = [ctx.Process(target=run_worker, args=(mode, path, w, threads, writes, results))
+                 for w in range(processes)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        counts = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+    ok = sum(c["ok"] for c in counts)
+    return {
+        "mode": mode,
+        "submits": ok,
+        "locked_errors": sum(c["locked"] for c in counts),
+        "seconds": round(elapsed, 3),
+        "submits_per_second": round(ok / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=100, help="rows per thread")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # Keep the throwaway default app away from instance/farmdata.db.
+    scratch = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'unused.db')}"
+
+    results = [run_mode(mode, args.processes, args.threads, args.writes) for mode in args.modes]
+    print(f"{'mode':<8} {'submits':>8} {'locked':>7} {'seconds':>8} {'submits/s':>10}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['submits']:>8} {r['locked_errors']:>7} {r['seconds']:>8} {r['submits_per_second']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
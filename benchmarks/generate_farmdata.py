@@ -0,0 +1,164 @@
+"""Bulk-loads synthetic FarmData rows into a SQLite database.
+
+Rows look like real submissions: a skewed number of submissions per
+user (a few farms submit often, most only a handful of times), times
+spread evenly over the last --days, Pennsylvania towns, and
+suggestion lists produced by the real scorer. The schema is created
+through the app, so the database has every index and migration.
+
+    python benchmarks/generate_farmdata.py /tmp/farm.db --rows 1000000 --users 200000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CITIES = (
+    "Chester Springs", "Lancaster", "York", "Gettysburg", "Harrisburg", "Reading", "Allentown", "Erie",
+    "State College", "Williamsport", "Chambersburg", "Carlisle", "Lebanon", "Hanover", "Ephrata",
+    "Lititz", "Kennett Square", "West Chester", "Doylestown", "Quakertown", "Bloomsburg", "Lewisburg",
+    "Huntingdon", "Bedford", "Somerset", "Indiana", "Meadville", "Titusville", "Wellsboro", "Towanda",
+)
+SOIL_TYPES = ("Sandy", "Loamy", "Clay", "Silt", "Peat")
+FERTILIZERS = ("", "Compost", "Manure", "NPK 10-10-10", "Urea", "Bone meal")
+PESTS = ("", "", "", "Aphids", "Japanese beetles", "Corn borer", "Blight", "Cutworms")
+BATCH_ROWS = 50_000
+COLUMNS = ("user_id", "soil_type", "soil_ph", "soil_moisture", "temperature", "rainfall", "crop_history",
+           "fertilizer_usage", "pest_issues", "city", "suggestions", "submitted_at")
+
+
+def create_schema(path):
+    """Creates the farmdata table, indexes and migrations through the app itself."""
+    from app import create_app, upgrade_schema
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(path)}", "STARTUP_WARMUP": False})
+    with app.app_context():
+        upgrade_schema()
+
+
+def user_ids(users, seed):
+    rng = np.random.default_rng(seed)
+    raw = rng.integers(0, 256, size=(users, 16), dtype=np.uint8)
+    return [str(uuid.UUID(bytes=bytes(row), version=4)) for row in raw]
+
+
+def suggestion_pool(rng, size=500):
+    """Top-7 lists for random profiles, scored by the app's scorer."""
+    from crops import encode_suggestions
+    from scoring import CROPS, WATER_SOURCE_FIELDS, current_scorer
+    from seasons import MONTHS
+
+    profiles = []
+    for _ in range(size):
+        profiles.append({
+            "soil_ph": float(rng.uniform(5.0, 7.8)),
+            "nitrogen": int(rng.integers(10, 250)),
+            "phosphorus": int(rng.integers(5, 120)),
+            "potassium": int(rng.integers(20, 250)),
+            "water_level": int(rng.integers(200, 800)),
+            "water_sources": tuple(bool(rng.integers(0, 2)) for _ in WATER_SOURCE_FIELDS),
+            "sow": list(rng.choice(MONTHS, size=int(rng.integers(1, 4)), replace=False)),
+            "harvest": list(rng.choice(MONTHS, size=int(rng.integers(1, 4)), replace=False)),
+            "previous_plants": list(rng.choice(CROPS, size=int(rng.integers(0, 3)), replace=False)),
+        })
+    return [encode_suggestions(s) for s in current_scorer().recommend_many(profiles)]
+
+
+def history_pool(rng, size=300):
+    from scoring import CROPS
+
+    return [", ".join(rng.choice(CROPS, size=int(rng.integers(0, 4)), replace=False)) for _ in range(size)]
+
+
+def generate(rng, count, start, end, pools):
+    """count rows as a list of tuples in COLUMNS order, dated between start and end."""
+    ids, suggestions, histories = pools
+    # Squaring a uniform skews submissions toward the low user indexes.
+    who = (len(ids) * rng.random(count) ** 2).astype(np.int64)
+    seconds = np.sort(rng.uniform(start, end, count))
+    stamps = np.char.replace(np.datetime_as_string(
+        (seconds * 1e6).astype("datetime64[us]"), unit="us"), "T", " ")
+    columns = [
+        [ids[i] for i in who],
+        rng.choice(SOIL_TYPES, count).tolist(),
+        np.round(np.clip(rng.normal(6.5, 0.6, count), 4.5, 8.5), 1).tolist(),
+        rng.integers(5, 70, count).astype(float).tolist(),
+        rng.integers(35, 95, count).astype(float).tolist(),
+        rng.integers(0, 80, count).astype(float).tolist(),
+        [histories[i] for i in rng.integers(0, len(histories), count)],
+        rng.choice(FERTILIZERS, count).tolist(),
+        rng.choice(PESTS, count).tolist(),
+        rng.choice(CITIES, count).tolist(),
+        [suggestions[i] for i in rng.integers(0, len(suggestions), count)],
+        stamps.tolist(),
+    ]
+    return list(zip(*columns))
+
+
+def row_count(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT count(*) FROM farmdata").fetchone()[0]
+
+
+def load(path, rows, users=None, days=730, seed=1, batch_rows=BATCH_ROWS, log=print):
+    """Tops the farmdata table of path up to `rows` rows; returns rows inserted per second.
+
+    Existing rows are kept, so a scale test can grow one database step by
+    step. New rows are spread over the whole history window too, so the
+    share of recent submissions stays the same as the table grows.
+    """
+    if not os.path.exists(path):
+        create_schema(path)
+    have = row_count(path)
+    if have >= rows:
+        return None
+    users = users or max(1, rows // 5)
+    rng = np.random.default_rng(seed + have)
+    pools = (user_ids(users, seed), suggestion_pool(rng), history_pool(rng))
+    conn = sqlite3.connect(path)
+    # A throwaway database: trade durability for load speed.
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=WAL")
+    end = time.time()
+    start = end - days * 86400
+    insert = f"INSERT INTO farmdata ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    begin = time.perf_counter()
+    todo = rows - have
+    done = 0
+    while done < todo:
+        count = min(batch_rows, todo - done)
+        with conn:
+            conn.executemany(insert, generate(rng, count, start, end, pools))
+        done += count
+        log(f"  {have + done:,} rows ({done / (time.perf_counter() - begin):,.0f} rows/s)")
+    conn.close()
+    return todo / (time.perf_counter() - begin)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database", help="SQLite file to create or extend")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="table size to reach")
+    parser.add_argument("--users", type=int, help="distinct user_ids (default rows / 5)")
+    parser.add_argument("--days", type=int, default=730, help="history the rows are spread over")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    # Keep the app module's default instance away from instance/farmdata.db.
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'unused.db')}")
+    rate = load(args.database, args.rows, args.users, args.days, args.seed)
+    if rate is None:
+        print(f"{args.database} already has {row_count(args.database):,} rows")
+    else:
+        print(f"Loaded {args.database} to {args.rows:,} rows at {rate:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Local stand-in for the OpenWeatherMap API, so benchmarks run offline.
+
+Answers /weather and /forecast for any city with a fixed payload after an
+optional delay. Point the app at it with OPENWEATHER_BASE_URL:
+
+    python benchmarks/weather_stub.py --port 8765 --delay 0.05
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8765 flask run
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def current_payload(city):
+    return {
+        "name": city,
+        "main": {"temp": 72.5, "humidity": 48, "pressure": 1015},
+        "weather": [{"main": "Clear", "description": "clear sky"}],
+        "wind": {"speed": 6.2},
+    }
+
+
+def forecast_payload(city, start=None):
+    start = int(start or time.time()) // 10800 * 10800
+    entries = []
+    for i in range(40):  # five days of 3-hour steps, like the real endpoint
+        entries.append({
+            "dt": start + i * 10800,
+            "main": {"temp": 60 + 15 * ((i % 8) / 7), "humidity": 40 + (i * 7) % 50},
+            "weather": [{"main": "Rain" if i % 9 == 4 else "Clear",
+                         "description": "light rain" if i % 9 == 4 else "clear sky"}],
+            "wind": {"speed": 3 + i % 5},
+            "pop": 0.6 if i % 9 == 4 else 0.05,
+        })
+    return {"city": {"name": city}, "cnt": len(entries), "list": entries}
+
+
+class WeatherStub:
+    """Threaded HTTP server on 127.0.0.1; counts the calls it answers."""
+
+    def __init__(self, port=0, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.calls += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                url = urlparse(self.path)
+                city = parse_qs(url.query).get("q", ["Unknown"])[0]
+                endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+                if endpoint == "weather":
+                    payload = current_payload(city)
+                elif endpoint == "forecast":
+                    payload = forecast_payload(city)
+                else:
+                    self.send_error(404)
+                    return
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="weather-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds before each response")
+    args = parser.parse_args()
+    stub = WeatherStub(args.port, args.delay)
+    print(f"Weather stub on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
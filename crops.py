@@ -0,0 +1,107 @@
+import json
+import re
+
+import numpy as np
+
+# Canonical crop names. A crop's id is its position here, so append new
+# crops to the end and never reorder.
+CROP_NAMES = (
+    "Peas", "Fava Beans", "Onions", "Leeks", "Garlic",
+    "Greens (Collards, Kale, Mustard)", "Turnips", "White Potatoes",
+    "Cabbage", "Lettuce", "Radishes", "Beets", "Carrots",
+    "Shallots", "Spinach", "Bok Choy", "Parsley", "Swiss Chard",
+    "Celery", "Watermelons", "Winter Squash", "Melons",
+    "Summer Squash", "Cucumbers", "Pumpkins", "Sweet Potatoes",
+    "Okra", "Chinese Cabbage", "Sweet Corn", "Peanuts",
+    "Lima Beans", "Beans (Bush, Pole, Shell, Dried)", "Black-Eyed Peas",
+    "Eggplant", "Peppers", "Tomato", "Basil", "Gandules (Pigeon Peas)",
+    "Collards (Cabbage Family)",
+)
+
+# Spellings used by the price list and the workbooks that differ by more
+# than spacing, punctuation or case.
+ALIASES = {
+    "Sweet Potato": "Sweet Potatoes",
+    "Greens (Collards, Kale, Mustard, Turnip, Etc.)": "Greens (Collards, Kale, Mustard)",
+    "Tomatoes": "Tomato",
+    "Pigeon Peas": "Gandules (Pigeon Peas)",
+}
+
+
+def normalize_crop(name):
+    """Lower-cased crop name with spacing and punctuation removed.
+
+    "Greens(Collards,Kale,Mustard)" and "Greens (Collards, Kale, Mustard)"
+    normalize to the same key.
+    """
+    return re.sub(r"[^a-z0-9]+", "", str(name).lower())
+
+
+def encode_suggestions(crops):
+    """FarmData.suggestions value for a list of crop names.
+
+    A JSON list, since crop names such as "Greens (Collards, Kale,
+    Mustard)" contain commas.
+    """
+    return json.dumps(list(crops))
+
+
+def decode_suggestions(value):
+    """Crop names stored by encode_suggestions(), or by the older comma-joined format."""
+    if not value:
+        return []
+    if value.startswith("["):
+        return json.loads(value)
+    # Comma-joined rows split names with commas into pieces; rejoin the
+    # pieces until each name's parentheses are balanced again.
+    crops, pending = [], ""
+    for piece in value.split(","):
+        pending = f"{pending},{piece}" if pending else piece
+        if pending.count("(") <= pending.count(")"):
+            crops.append(pending.strip())
+            pending = ""
+    if pending:
+        crops.append(pending.strip())
+    return [crop for crop in crops if crop]
+
+
+class CropRegistry:
+    """Maps every spelling of a crop to one compact integer id.
+
+    Tables, prices and scoring arrays are keyed by id, so a crop spelled
+    one way in a workbook and another way in the price list is still the
+    same row.
+    """
+
+    def __init__(self, names=CROP_NAMES, aliases=ALIASES):
+        self.names = tuple(names)
+        self._ids = {normalize_crop(name): i for i, name in enumerate(self.names)}
+        for alias, name in aliases.items():
+            self._ids[normalize_crop(alias)] = self._ids[normalize_crop(name)]
+
+    def __len__(self):
+        return len(self.names)
+
+    def id_of(self, name):
+        """The crop's id, or None for a name that is not a known crop."""
+        return self._ids.get(normalize_crop(name))
+
+    def ids_of(self, names):
+        """Array of ids for names; unknown names get -1."""
+        return np.array([self._ids.get(normalize_crop(name), -1) for name in names], dtype=np.int64)
+
+    def name_of(self, crop_id):
+        return self.names[crop_id]
+
+    def table(self, mapping):
+        """A {name: value} dict as a list indexed by crop id (None where missing)."""
+        rows = [None] * len(self.names)
+        for name, value in mapping.items():
+            crop_id = self.id_of(name)
+            if crop_id is None:
+                raise KeyError(f"Unknown crop: {name}")
+            rows[crop_id] = value
+        return rows
+
+
+crop_registry = CropRegistry()
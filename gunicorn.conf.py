@@ -0,0 +1,33 @@
+"""gunicorn settings, read automatically when gunicorn starts in this directory.
+
+By default the app is preloaded: the master imports it, warms it up and
+moves the reference arrays into shared read-only memory, then forks the
+workers, which share those pages instead of each loading their own copy.
+GUNICORN_PRELOAD=0 goes back to every worker importing the app itself.
+"""
+import gc
+import os
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+
+if preload_app:
+    # Read by create_app(): share reference data, defer threads to post_fork.
+    os.environ["FORK_PRELOAD"] = "1"
+    # Collections in the master would leave freed holes in pages the
+    # workers are about to share.
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Keeps the workers' collector away from everything loaded so far, so
+        # scanning it doesn't copy the shared pages.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+        from app import after_fork, app
+
+        after_fork(app)
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from batch import chunked
+from crops import crop_registry, decode_suggestions
+from prices import price_store
+from reference_data import reference_store
+from seasons import ALL_MONTHS, MonthIndex
+
+# Length of the harvest window picked for each crop, in days.
+HARVEST_WINDOW_DAYS = int(os.environ.get("HARVEST_WINDOW_DAYS", 2))
+# Windows scoring below this are not recommended on the page.
+HARVEST_MIN_SCORE = float(os.environ.get("HARVEST_MIN_SCORE", 0.5))
+# Temperatures are Fahrenheit (the weather client asks for imperial units).
+# Field work is fine between COOL_F and WARM_F and impossible past FROST_F / HEAT_F.
+FROST_F, COOL_F, WARM_F, HEAT_F = 32.0, 45.0, 85.0, 95.0
+CALM_MPH, GALE_MPH = 15.0, 30.0
+# Weight of a day outside the crop's harvest months.
+OFF_SEASON_WEIGHT = 0.5
+SECONDS_PER_DAY = 86400
+PLAN_BATCH_SIZE = 1000
+
+
+class DailyForecast:
+    """A /forecast payload's 3-hour steps rolled up into calendar days.
+
+    Days are in the city's local time when the payload gives its UTC
+    offset. Each field is an array with one value per day.
+    """
+
+    def __init__(self, days, temp_min, temp_max, pop, rain, wind):
+        self.days = days
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.pop = pop
+        self.rain = rain
+        self.wind = wind
+
+    def __len__(self):
+        return len(self.days)
+
+    @classmethod
+    def from_payload(cls, payload):
+        steps = payload.get("list") or []
+        offset = (payload.get("city") or {}).get("timezone") or 0
+        stamps = np.array([step["dt"] for step in steps], dtype=np.int64) + offset
+        days, day = np.unique(stamps // SECONDS_PER_DAY, return_inverse=True)
+        n = len(days)
+
+        def rollup(values, combine, initial):
+            out = np.full(n, initial, dtype=float)
+            combine.at(out, day, np.asarray(values, dtype=float))
+            return out
+
+        main = [step.get("main") or {} for step in steps]
+        temps = [m.get("temp", np.nan) for m in main]
+        return cls(
+            days=days.astype("datetime64[D]"),
+            temp_min=rollup([m.get("temp_min", t) for m, t in zip(main, temps)], np.minimum, np.inf),
+            temp_max=rollup([m.get("temp_max", t) for m, t in zip(main, temps)], np.maximum, -np.inf),
+            pop=rollup([step.get("pop", 0.0) for step in steps], np.maximum, 0.0),
+            rain=rollup([(step.get("rain") or {}).get("3h", 0.0) for step in steps], np.add, 0.0),
+            wind=rollup([(step.get("wind") or {}).get("speed", 0.0) for step in steps], np.maximum, 0.0),
+        )
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls.from_payload(json.load(f))
+
+    def months(self):
+        """0-based month of each day."""
+        return self.days.astype("datetime64[M]").astype(np.int64) % 12
+
+    def workability(self):
+        """0..1 per day: how good the day is for harvesting, whatever the crop.
+
+        The product of a dry-weather term (chance and amount of rain), a
+        temperature term (cold or hot days fall to 0 at frost and heat) and
+        a wind term.
+        """
+        dry = (1.0 - np.clip(self.pop, 0.0, 1.0)) * np.exp(-self.rain / 10.0)
+        cold = np.clip((self.temp_min - FROST_F) / (COOL_F - FROST_F), 0.0, 1.0)
+        hot = np.clip((HEAT_F - self.temp_max) / (HEAT_F - WARM_F), 0.0, 1.0)
+        calm = np.clip((GALE_MPH - self.wind) / (GALE_MPH - CALM_MPH), 0.0, 1.0)
+        return np.nan_to_num(dry * cold * hot * calm)
+
+
+class HarvestOptimizer:
+    """Best harvest window for every crop over one or many forecasts.
+
+    A crop's score on a day is the day's workability, weighted down
+    outside the crop's harvest months. Windows of `window` days are
+    compared with a cumulative sum along the day axis, so all crops and
+    all forecasts are scored in one pass over a (forecasts x crops x days)
+    array. Value is the window score times the crop's latest price.
+    """
+
+    def __init__(self, timing, prices, registry=crop_registry, version=None):
+        self.registry = registry
+        self.version = version
+        n = len(registry)
+        # Crops without a harvest season in the workbook are never off season.
+        seasons = np.full(n, ALL_MONTHS, dtype=np.int64)
+        ids = registry.ids_of(timing["Crop Name"].tolist())
+        masks = MonthIndex(timing["Harvest Time"].fillna("").tolist()).masks
+        known = (ids >= 0) & (masks != 0)
+        # Reversed so the first row of a crop wins, like the scorer's lookups.
+        seasons[ids[known][::-1]] = masks[known][::-1]
+        months = np.arange(12)
+        self.in_season = (seasons[:, np.newaxis] >> months & 1).astype(bool)
+        self.season_weight = np.where(self.in_season, 1.0, OFF_SEASON_WEIGHT)
+        self.prices = np.asarray(prices, dtype=float)
+
+    @classmethod
+    def from_stores(cls, store=reference_store, prices=price_store):
+        version = (store.version(), prices.version())
+        return cls(store.get("timeToSowAndHarvest"), prices.index().latest, version=version)
+
+    def score_many(self, crop_ids, forecasts, window=HARVEST_WINDOW_DAYS):
+        """Best window per forecast and crop.
+
+        Returns (start, score) arrays of shape (forecasts, crops): the index
+        of the window's first day and its mean daily score. Forecasts of
+        different lengths are padded; windows never cover padding.
+        """
+        crop_ids = np.asarray(crop_ids, dtype=np.int64)
+        days = max((len(f) for f in forecasts), default=0)
+        window = max(1, min(window, days))
+        workable = np.zeros((len(forecasts), days))
+        months = np.zeros((len(forecasts), days), dtype=np.int64)
+        valid = np.zeros((len(forecasts), days), dtype=bool)
+        for i, forecast in enumerate(forecasts):
+            workable[i, :len(forecast)] = forecast.workability()
+            months[i, :len(forecast)] = forecast.months()
+            valid[i, :len(forecast)] = True
+        # (forecasts x crops x days) daily scores.
+        daily = workable[:, np.newaxis, :] * self.season_weight[crop_ids][:, months].transpose(1, 0, 2)
+        totals = np.cumsum(np.pad(daily, ((0, 0), (0, 0), (1, 0))), axis=2)
+        windows = (totals[:, :, window:] - totals[:, :, :-window]) / window
+        covered = np.cumsum(np.pad(valid, ((0, 0), (1, 0))), axis=1)
+        full = (covered[:, window:] - covered[:, :-window]) == window
+        windows = np.where(full[:, np.newaxis, :], windows, -np.inf)
+        start = windows.argmax(axis=2)
+        score = np.take_along_axis(windows, start[..., np.newaxis], axis=2)[..., 0]
+        return start, np.where(np.isfinite(score), score, 0.0)
+
+    def windows_many(self, crop_ids, forecasts, window=HARVEST_WINDOW_DAYS):
+        """Best window of each crop, as one list of dicts per forecast, in crop_ids order."""
+        crop_ids = np.asarray(crop_ids, dtype=np.int64)
+        crop_ids = crop_ids[crop_ids >= 0]
+        if len(crop_ids) == 0 or not any(len(f) for f in forecasts):
+            return [[] for _ in forecasts]
+        start, score = self.score_many(crop_ids, forecasts, window)
+        prices = self.prices[crop_ids]
+        value = score * np.nan_to_num(prices)
+        results = []
+        for i, forecast in enumerate(forecasts):
+            if not len(forecast):
+                results.append([])
+                continue
+            span = max(1, min(window, len(forecast)))
+            first = forecast.days[start[i]]
+            months = forecast.months()[start[i]]
+            results.append([{
+                "crop_id": int(crop_id),
+                "crop": self.registry.name_of(crop_id),
+                "start": str(first[j]),
+                "end": str(first[j] + np.timedelta64(span - 1, "D")),
+                "score": round(float(score[i, j]), 3),
+                "in_season": bool(self.in_season[crop_id, months[j]]),
+                "price": None if np.isnan(prices[j]) else float(prices[j]),
+                "value": round(float(value[i, j]), 3),
+            } for j, crop_id in enumerate(crop_ids.tolist())])
+        return results
+
+    def plan_many(self, crop_ids, forecasts, window=HARVEST_WINDOW_DAYS):
+        """One list of windows per forecast, best value first."""
+        return [rank(windows) for windows in self.windows_many(crop_ids, forecasts, window)]
+
+    def plan(self, crop_ids, forecast, window=HARVEST_WINDOW_DAYS):
+        return self.plan_many(crop_ids, [forecast], window)[0]
+
+
+def rank(windows):
+    return sorted(windows, key=lambda w: (-w["value"], -w["score"]))
+
+
+def plan_users(rows, forecast_for, optimizer=None, window=HARVEST_WINDOW_DAYS):
+    """Batch mode: yields a harvest plan for each (data_id, user_id, city, suggestions) row.
+
+    Every crop is scored once per city, the first time the city is seen,
+    and each user's plan is picked out of that city's windows, so the cost
+    grows with the number of cities rather than users. forecast_for(city)
+    returns a DailyForecast or None.
+    """
+    optimizer = optimizer or current_harvest_optimizer()
+    all_crops = np.arange(len(optimizer.registry))
+    by_city = {}
+    for chunk in chunked(rows, PLAN_BATCH_SIZE):
+        cities = list(dict.fromkeys(city for _, _, city, _ in chunk if city not in by_city))
+        forecasts = {city: forecast_for(city) for city in cities}
+        known = [city for city in cities if forecasts[city] is not None]
+        by_city.update(dict.fromkeys(cities))
+        by_city.update(zip(known, optimizer.windows_many(all_crops, [forecasts[c] for c in known], window)))
+        for data_id, user_id, city, suggestions in chunk:
+            plan = {"data_id": data_id, "user_id": user_id, "city": city}
+            windows = by_city[city]
+            if not windows:
+                plan["error"] = "forecast unavailable"
+            else:
+                ids = optimizer.registry.ids_of(decode_suggestions(suggestions))
+                plan["windows"] = rank([windows[i] for i in ids.tolist() if i >= 0])
+            yield plan
+
+
+_optimizer = None
+_optimizer_lock = threading.Lock()
+
+
+def current_harvest_optimizer(store=reference_store, prices=price_store):
+    """Returns the shared optimizer, rebuilding it when the workbook or price file changes."""
+    global _optimizer
+    version = (store.version(), prices.version())
+    optimizer = _optimizer
+    if optimizer is None or optimizer.version != version:
+        with _optimizer_lock:
+            if _optimizer is None or _optimizer.version != version:
+                _optimizer = HarvestOptimizer.from_stores(store, prices)
+            optimizer = _optimizer
+    return optimizer
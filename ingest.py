@@ -0,0 +1,127 @@
+import csv
+import time
+from datetime import datetime, timezone
+
+from batch import chunked, iter_jsonl
+
+INGEST_CHUNK_SIZE = 1000
+CSV_MIMETYPES = ("text/csv", "application/csv")
+# Plausible bounds per reading; temperature is Fahrenheit, rainfall inches.
+READING_RANGES = {
+    "soil_ph": (0.0, 14.0),
+    "soil_moisture": (0.0, 100.0),
+    "temperature": (-60.0, 140.0),
+    "rainfall": (0.0, 1000.0),
+}
+TEXT_FIELDS = {"field": 64, "city": 100, "soil_type": 50}
+TIMESTAMP_KEYS = ("timestamp", "submitted_at")
+USER_ID_LENGTH = 36
+MAX_REPORTED_ERRORS = 50
+
+
+class StreamError(ValueError):
+    """The rest of the upload can't be read; ingestion stops at this record."""
+
+
+def _decoded_lines(stream):
+    # Decoded a line at a time, so a bad byte stops reading at its own record.
+    # utf-8-sig drops the BOM Excel writes at the start of "CSV UTF-8" files.
+    for i, line in enumerate(stream):
+        yield line.decode("utf-8-sig" if i == 0 else "utf-8") if isinstance(line, bytes) else line
+
+
+def iter_csv(stream):
+    """Yields one dict per CSV record, reading the stream a line at a time."""
+    yield from csv.DictReader(_decoded_lines(stream))
+
+
+def parse_timestamp(value):
+    """ISO 8601 or epoch seconds, as a naive UTC datetime like FarmData.submitted_at."""
+    if isinstance(value, (int, float)) or str(value).replace(".", "", 1).isdigit():
+        return datetime.fromtimestamp(float(value), timezone.utc).replace(tzinfo=None)
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_reading(raw, default_user=None):
+    """Validated FarmData column values for one reading; raises ValueError."""
+    if isinstance(raw, Exception):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValueError("reading must be an object")
+    row = {}
+    user_id = raw.get("user_id") or default_user
+    if not user_id:
+        raise ValueError("user_id is required")
+    user_id = str(user_id)
+    if len(user_id) > USER_ID_LENGTH:
+        raise ValueError(f"user_id longer than {USER_ID_LENGTH} characters")
+    row["user_id"] = user_id
+    for name, (low, high) in READING_RANGES.items():
+        value = raw.get(name)
+        if value is None or value == "":
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} is not a number: {value!r}")
+        if not (low <= value <= high):
+            raise ValueError(f"{name} {value} outside {low}..{high}")
+        row[name] = value
+    if len(row) == 1:
+        raise ValueError("no readings (soil_ph, soil_moisture, temperature or rainfall)")
+    for name, limit in TEXT_FIELDS.items():
+        value = raw.get(name)
+        if value:
+            row[name] = str(value)[:limit]
+    stamp = next((raw[key] for key in TIMESTAMP_KEYS if raw.get(key) not in (None, "")), None)
+    try:
+        row["submitted_at"] = parse_timestamp(stamp) if stamp is not None else datetime.utcnow()
+    except (OverflowError, OSError, ValueError):
+        raise ValueError(f"bad timestamp: {stamp!r}")
+    return row
+
+
+def records(stream, fmt):
+    """Raw records of an upload; a decoding or CSV syntax error ends it with a StreamError."""
+    try:
+        yield from iter_csv(stream) if fmt == "csv" else iter_jsonl(stream)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        yield StreamError(f"unreadable input, stopped reading: {exc}")
+
+
+def ingest(raw_records, store_chunk, default_user=None, chunk_size=INGEST_CHUNK_SIZE):
+    """Validates a stream of readings and hands them to store_chunk, chunk_size at a time.
+
+    Invalid records are counted and skipped; they never fail the chunk.
+    An unreadable stream stops ingestion after storing the rows read so
+    far, with "complete" false and the reason as the last error. Returns a
+    report with accepted/rejected counts, the first errors and the rate.
+    """
+    start = time.perf_counter()
+    report = {"accepted": 0, "rejected": 0, "chunks": 0, "complete": True, "errors": []}
+    position = 0
+    for chunk in chunked(raw_records, chunk_size):
+        rows = []
+        for raw in chunk:
+            position += 1
+            if isinstance(raw, StreamError):
+                report["complete"] = False
+                report["errors"].append({"record": position, "error": str(raw)})
+                continue
+            try:
+                rows.append(parse_reading(raw, default_user))
+            except ValueError as exc:
+                report["rejected"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"record": position, "error": str(exc)})
+        if rows:
+            store_chunk(rows)
+            report["chunks"] += 1
+            report["accepted"] += len(rows)
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["accepted"] / elapsed) if elapsed > 0 else None
+    return report
@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+JOB_WORKERS = 2
+
+
+class JobQueue:
+    """Local background job runner on a thread pool; no external broker.
+
+    Tracks queue depth plus queue-wait and run-time totals so the backlog
+    and job latency can be watched from a stats endpoint.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, name="jobs"):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._failed = {}
+        self.workers = workers
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_latency = 0.0
+
+    def submit(self, key, fn, *args):
+        enqueued = time.perf_counter()
+        with self._lock:
+            self.submitted += 1
+        return self._executor.submit(self._run, key, enqueued, fn, *args)
+
+    def _run(self, key, enqueued, fn, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self.started += 1
+            self.wait_seconds += started - enqueued
+        try:
+            return fn(*args)
+        except Exception as exc:
+            log.exception("Job %s failed", key)
+            with self._lock:
+                self.failed += 1
+                self._failed[key] = str(exc)
+            raise
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.completed += 1
+                self.run_seconds += finished - started
+                self.max_latency = max(self.max_latency, finished - enqueued)
+
+    def error(self, key):
+        """Error message of a failed job run by this process, else None."""
+        return self._failed.get(key)
+
+    def stats(self):
+        with self._lock:
+            done = self.completed
+            return {
+                "workers": self.workers,
+                "queue_depth": self.submitted - self.started,
+                "running": self.started - self.completed,
+                "submitted": self.submitted,
+                "completed": done,
+                "failed": self.failed,
+                "mean_wait_seconds": self.wait_seconds / done if done else None,
+                "mean_run_seconds": self.run_seconds / done if done else None,
+                "mean_latency_seconds": (self.wait_seconds + self.run_seconds) / done if done else None,
+                "max_latency_seconds": self.max_latency,
+            }
@@ -0,0 +1,78 @@
+import logging
+
+from sqlalchemy import text
+
+from crops import decode_suggestions, encode_suggestions
+
+log = logging.getLogger(__name__)
+
+
+def add_column(table, column, ddl):
+    """Migration step adding a column, unless create_all already made it."""
+    def step(conn):
+        columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return step
+
+
+def suggestions_to_json(conn, batch_size=10000):
+    """Rewrites comma-joined FarmData.suggestions as JSON lists."""
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, suggestions FROM farmdata WHERE id > :last AND suggestions IS NOT NULL "
+            "AND suggestions != '' AND suggestions NOT LIKE '[%' ORDER BY id LIMIT :limit"),
+            {"last": last_id, "limit": batch_size}).all()
+        if not rows:
+            return
+        conn.execute(text("UPDATE farmdata SET suggestions = :value WHERE id = :id"),
+                     [{"id": row_id, "value": encode_suggestions(decode_suggestions(value))} for row_id, value in rows])
+        last_id = rows[-1][0]
+
+
+# Ordered schema changes for databases created before the change was made.
+# The applied version is kept in SQLite's PRAGMA user_version; append new
+# steps to the end and never edit or reorder existing ones. A step is SQL
+# text or a callable taking the connection.
+MIGRATIONS = [
+    (
+        "composite index for latest-submission lookups",
+        ["CREATE INDEX IF NOT EXISTS ix_farmdata_user_submitted ON farmdata (user_id, submitted_at)"],
+    ),
+    (
+        "covering index for the active-cities query",
+        ["CREATE INDEX IF NOT EXISTS ix_farmdata_submitted_city ON farmdata (submitted_at, city)"],
+    ),
+    (
+        "field column for ingested sensor readings",
+        [add_column("farmdata", "field", "VARCHAR(64)")],
+    ),
+    (
+        "suggestions stored as JSON lists, since crop names contain commas",
+        [suggestions_to_json],
+    ),
+]
+
+
+def schema_version(conn):
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def upgrade(engine):
+    """Applies pending migrations in order; returns the resulting version."""
+    with engine.begin() as conn:
+        version = schema_version(conn)
+        for number, (description, statements) in enumerate(MIGRATIONS, 1):
+            if number <= version:
+                continue
+            log.info("Applying migration %d: %s", number, description)
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            # PRAGMA doesn't take bound parameters; number is always an int.
+            conn.execute(text(f"PRAGMA user_version = {int(number)}"))
+            version = number
+    return version
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from reference_data import DATA_DIR
+
+MODEL_PATH = os.path.join(DATA_DIR, "yield_model.json")
+PICKLE_PATH = os.path.join(DATA_DIR, "yield_model.pkl")
+# How often get() may stat the model file to look for a new version.
+CHECK_INTERVAL = 1.0
+
+log = logging.getLogger(__name__)
+
+
+class LinearYieldModel:
+    """Closed-form linear model: yield = features @ coef + intercept."""
+
+    def __init__(self, features, coef, intercept, version=None):
+        self.features = tuple(features)
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.version = version
+
+    @classmethod
+    def from_json(cls, path, version=None):
+        with open(path) as f:
+            params = json.load(f)
+        return cls(params["features"], params["coef"], params["intercept"], version)
+
+    @classmethod
+    def from_pickle(cls, path, version=None):
+        # Unpickling pulls in sklearn; this only runs when no JSON export exists.
+        import joblib
+
+        model = joblib.load(path)
+        features = getattr(model, "feature_names_in_", ("temperature", "rainfall", "soil_ph"))
+        return cls(list(features), model.coef_, model.intercept_, version)
+
+    def predict_many(self, rows):
+        """Predicted yield for each row of (temperature, rainfall, soil_ph) values."""
+        return np.atleast_2d(np.asarray(rows, dtype=float)) @ self.coef + self.intercept
+
+    def predict(self, *values):
+        return float(self.predict_many([values])[0])
+
+
+class ModelRegistry:
+    """Holds the current yield model and swaps in a new one when its file changes.
+
+    The model is replaced by a single reference assignment, so a request
+    always sees either the old model or the new one, never a partial load.
+    A file that fails to load leaves the previous model in place until the
+    file changes again.
+    """
+
+    def __init__(self, path=MODEL_PATH, pickle_path=PICKLE_PATH, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.pickle_path = pickle_path
+        self.check_interval = check_interval
+        self._model = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _source(self):
+        for path in (self.path, self.pickle_path):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return path, (path, st.st_mtime_ns, st.st_size)
+        return None, None
+
+    def load(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            path, signature = self._source()
+            if signature is None or signature == self._signature:
+                return self._model
+            try:
+                if path.endswith(".json"):
+                    model = LinearYieldModel.from_json(path, signature)
+                else:
+                    model = LinearYieldModel.from_pickle(path, signature)
+            except Exception:
+                log.exception("Could not load yield model from %s", path)
+                # Don't retry the same broken file on every check.
+                self._signature = signature
+                return self._model
+            self._model, self._signature = model, signature
+            self.reloads += 1
+            log.info("Loaded yield model from %s", path)
+            return model
+
+    def get(self):
+        """The current model, or None when no model file exists."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            return self.load()
+        return self._model
+
+    def predict_many(self, rows):
+        model = self.get()
+        if model is None:
+            raise LookupError("No yield model is available")
+        return model.predict_many(rows)
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,90 @@
+import logging
+import mmap
+
+import numpy as np
+
+from harvest import current_harvest_optimizer
+from prices import price_store
+from scoring import current_scorer
+from yield_index import current_yield_index
+
+# Array starts are aligned so views keep NumPy's preferred alignment.
+ALIGN = 64
+
+log = logging.getLogger(__name__)
+
+
+def share_arrays(arrays):
+    """Copies arrays into one anonymous shared mapping; returns read-only views.
+
+    Mapped before gunicorn forks, the pages are shared by every worker and
+    never copied: they hold no Python objects, so refcounting and the
+    garbage collector never write to them.
+    """
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    offsets, size = [], 0
+    for a in arrays:
+        size = -(-size // ALIGN) * ALIGN
+        offsets.append(size)
+        size += a.nbytes
+    arena = mmap.mmap(-1, max(size, 1))
+    views = []
+    for a, offset in zip(arrays, offsets):
+        view = np.frombuffer(arena, dtype=a.dtype, count=a.size, offset=offset).reshape(a.shape)
+        view[...] = a
+        view.flags.writeable = False
+        views.append(view)
+    return views, size
+
+
+def _targets():
+    """(object, attribute) of every array behind the reference data lookups."""
+    scorer = current_scorer()
+    optimizer = current_harvest_optimizer()
+    yields = current_yield_index()
+    targets = [(scorer, name) for name in ("lower", "upper", "water_sources", "crop_ids")]
+    targets += [(scorer.sow_index, "masks"), (scorer.harvest_index, "masks")]
+    targets += [(price_store.index(), "latest")]
+    targets += [(optimizer, name) for name in ("in_season", "season_weight", "prices")]
+    targets += [(yields, name) for name in ("points", "yields", "mean", "scale")]
+    return targets
+
+
+def share_reference_data():
+    """Moves the scorer, price, harvest and yield arrays into shared read-only memory.
+
+    Called once in the gunicorn master after warmup. A worker that later
+    sees a changed reference file rebuilds its own private copy as usual.
+    Returns the number of bytes shared.
+    """
+    targets = _targets()
+    scorer = current_scorer()
+    years = list(scorer.rotation_masks)
+    views, size = share_arrays([getattr(obj, name) for obj, name in targets] +
+                               [scorer.rotation_masks[year] for year in years])
+    for (obj, name), view in zip(targets, views):
+        setattr(obj, name, view)
+    scorer.rotation_masks = dict(zip(years, views[len(targets):]))
+    log.info("Shared %d reference arrays (%d bytes) before fork", len(views), size)
+    return size
+
+
+def process_memory(pid="self"):
+    """RSS, PSS and USS of a process in bytes, from /proc/<pid>/smaps_rollup (Linux).
+
+    PSS splits each shared page between the processes mapping it, so the
+    PSS of all workers adds up to what they really cost; USS is the memory
+    a process would free on exit.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
@@ -0,0 +1,129 @@
+import bisect
+import csv
+import logging
+import os
+import threading
+from datetime import date
+
+import numpy as np
+
+from crops import crop_registry
+from reference_data import DATA_DIR, FileCache, file_signature
+
+PRICES_PATH = os.path.join(DATA_DIR, "market_prices.csv")
+PRICE_COLUMNS = ("date", "crop", "price")
+
+log = logging.getLogger(__name__)
+
+
+class PriceIndex:
+    """One parse of the price file: history per crop id plus latest-price arrays."""
+
+    def __init__(self, rows, registry):
+        self.unknown = set()
+        history = {}
+        for row in rows:
+            crop_id = registry.id_of(row["crop"])
+            if crop_id is None:
+                self.unknown.add(row["crop"])
+                continue
+            history.setdefault(crop_id, []).append((date.fromisoformat(row["date"]), float(row["price"])))
+        if self.unknown:
+            log.warning("Unknown crops in market prices: %s", sorted(self.unknown))
+        self.dates = {}
+        self.prices = {}
+        self.latest = np.full(len(registry), np.nan)
+        for crop_id, points in history.items():
+            # Stable sort, so the later row wins between two prices on one day.
+            points.sort(key=lambda point: point[0])
+            self.dates[crop_id] = [day for day, _ in points]
+            self.prices[crop_id] = [price for _, price in points]
+            self.latest[crop_id] = points[-1][1]
+        self.rows = sum(len(points) for points in history.values())
+
+
+class PriceStore:
+    """Dated market prices per crop, kept in data/market_prices.csv.
+
+    The file is parsed once into a PriceIndex and re-read only when its
+    mtime or size changes. Latest prices live in an array indexed by crop
+    id, so a lookup is one array read instead of a dict built per request.
+    """
+
+    def __init__(self, path=PRICES_PATH, registry=crop_registry):
+        self.path = path
+        self.registry = registry
+        self._cache = FileCache(missing_ok=True)
+        self._write_lock = threading.Lock()
+        self._loads = 0
+
+    def index(self):
+        return self._cache.get("prices", self.path, self._load)
+
+    def _load(self, signature):
+        rows = []
+        if signature is not None:
+            with open(self.path, newline="") as f:
+                rows = list(csv.DictReader(f))
+        index = PriceIndex(rows, self.registry)
+        self._loads += 1
+        log.info("Loaded %d market prices from %s", index.rows, self.path)
+        return index
+
+    def _crop_id(self, crop):
+        return crop if isinstance(crop, (int, np.integer)) else self.registry.id_of(crop)
+
+    def latest(self, crop):
+        """Most recent price of a crop (id or name), or None if it has none."""
+        crop_id = self._crop_id(crop)
+        if crop_id is None or crop_id < 0:
+            return None
+        price = self.index().latest[crop_id]
+        return None if np.isnan(price) else float(price)
+
+    def latest_prices(self):
+        """{crop name: latest price} for every priced crop, in crop id order."""
+        latest = self.index().latest
+        return {self.registry.name_of(i): float(latest[i]) for i in np.flatnonzero(~np.isnan(latest))}
+
+    def history(self, crop, since=None):
+        """[(date, price)] for a crop, oldest first, optionally from `since` on."""
+        index = self.index()
+        crop_id = self._crop_id(crop)
+        dates = index.dates.get(crop_id, [])
+        start = bisect.bisect_left(dates, since) if since else 0
+        return list(zip(dates[start:], index.prices[crop_id][start:])) if dates else []
+
+    def record(self, crop, price, day=None):
+        """Appends a dated price; the index picks it up through the file signature."""
+        crop_id = self.registry.id_of(crop)
+        if crop_id is None:
+            raise KeyError(f"Unknown crop: {crop}")
+        price = float(price)
+        if not price >= 0:
+            raise ValueError(f"price must be a non-negative number: {price!r}")
+        day = day or date.today()
+        with self._write_lock:
+            new_file = file_signature(self.path, missing_ok=True) is None
+            with open(self.path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(PRICE_COLUMNS)
+                writer.writerow([day.isoformat(), self.registry.name_of(crop_id), f"{price:.2f}"])
+        return crop_id
+
+    def version(self):
+        return file_signature(self.path, missing_ok=True)
+
+    def stats(self):
+        index = self.index()
+        return {
+            "path": self.path,
+            "rows": index.rows,
+            "priced_crops": int((~np.isnan(index.latest)).sum()),
+            "unknown_crops": sorted(index.unknown),
+            "loads": self._loads,
+        }
+
+
+price_store = PriceStore()
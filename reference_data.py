@@ -0,0 +1,122 @@
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Workbooks read by the crop recommendation in submit().
+REFERENCE_WORKBOOKS = (
+    "timeToSowAndHarvest",
+    "waterToCrops",
+    "phToCrops",
+    "nutrientsToCrops",
+    "cropRotationCycle",
+)
+
+log = logging.getLogger(__name__)
+
+
+def file_signature(path, missing_ok=False):
+    """(mtime, size) of a file; None for a missing file when missing_ok."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        if missing_ok:
+            return None
+        raise
+    return (st.st_mtime_ns, st.st_size)
+
+
+class FileCache:
+    """Values built from files, rebuilt only when a file's (mtime, size) changes.
+
+    get() checks the signature without locking; a changed file is reloaded
+    under the lock, once, however many threads noticed it.
+    """
+
+    def __init__(self, missing_ok=False):
+        self.missing_ok = missing_ok
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, path, load):
+        """The value for key, calling load(signature) if path changed since it was built."""
+        signature = file_signature(path, self.missing_ok)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return entry[1]
+        with self._lock:
+            # Another thread may have reloaded the file while we waited.
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            value = load(signature)
+            self._entries[key] = (signature, value)
+            return value
+
+    def keys(self):
+        return list(self._entries)
+
+
+class ReferenceStore:
+    """Parses each reference workbook once and keeps the DataFrame in memory.
+
+    A table is re-read only when its file's mtime or size changes, so steady
+    state requests never reach openpyxl. The returned frames are shared
+    between requests and must be treated as read-only.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, names=REFERENCE_WORKBOOKS):
+        self.data_dir = data_dir
+        self.names = tuple(names)
+        self._tables = FileCache()
+        self._loads = {name: 0 for name in self.names}
+        self._load_seconds = {name: 0.0 for name in self.names}
+
+    def path(self, name):
+        return os.path.join(self.data_dir, f"{name}.xlsx")
+
+    def get(self, name):
+        if name not in self.names:
+            raise KeyError(f"Unknown reference table: {name}")
+        return self._tables.get(name, self.path(name), lambda signature: self._load(name))
+
+    def _load(self, name):
+        start = time.perf_counter()
+        frame = pd.read_excel(self.path(name), engine="openpyxl")
+        elapsed = time.perf_counter() - start
+        self._loads[name] += 1
+        self._load_seconds[name] += elapsed
+        log.info("Loaded reference table %s in %.3fs", name, elapsed)
+        return frame
+
+    def tables(self):
+        return {name: self.get(name) for name in self.names}
+
+    def preload(self):
+        self.tables()
+        return self
+
+    def version(self):
+        """Signature of every workbook; changes whenever any file is edited."""
+        return tuple(file_signature(self.path(name)) for name in self.names)
+
+    def stats(self):
+        return {
+            "hits": self._tables.hits,
+            "misses": self._tables.misses,
+            "loads": dict(self._loads),
+            "load_seconds": {name: round(s, 6) for name, s in self._load_seconds.items()},
+            "cached": sorted(self._tables.keys()),
+        }
+
+
+reference_store = ReferenceStore()
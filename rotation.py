@@ -0,0 +1,83 @@
+from crops import crop_registry, normalize_crop
+
+PLAN_YEARS = 3
+MAX_PLAN_YEARS = 4
+
+
+class RotationIndex:
+    """Inverted index from crop id to the rotation year(s) that plant it.
+
+    Each year's "Crops to Plant" list is split once, so finding the year of
+    a previously planted crop is a dict hit instead of a scan of the table.
+    """
+
+    def __init__(self, frame, registry=crop_registry):
+        self.registry = registry
+        self.years = []
+        self.groups = {}
+        self.benefits = {}
+        self.crops_by_year = {}
+        self.years_by_crop = {}
+        # Normalized crop names per year, for the substring fallback of years_for().
+        self.normalized_by_year = {}
+        has_benefits = "Soil Impact & Benefits" in frame.columns
+        for _, row in frame.iterrows():
+            year = row["Year"]
+            if year in self.crops_by_year:
+                continue
+            crops = str(row["Crops to Plant"]).split(", ")
+            self.years.append(year)
+            self.crops_by_year[year] = crops
+            self.normalized_by_year[year] = [normalize_crop(c) for c in crops]
+            self.groups[year] = row.get("Crop Group")
+            self.benefits[year] = row["Soil Impact & Benefits"] if has_benefits else None
+            for crop in crops:
+                crop_id = registry.id_of(crop)
+                if crop_id is not None:
+                    self.years_by_crop.setdefault(crop_id, []).append(year)
+
+    def years_for(self, crop):
+        """Rotation years that plant crop, in table order.
+
+        Names that are not an exact crop (e.g. "pea") fall back to a
+        substring match against the crop names, as the old lookup did.
+        """
+        years = self.years_by_crop.get(self.registry.id_of(crop))
+        if years is not None:
+            return years
+        key = normalize_crop(crop)
+        return [year for year in self.years
+                if any(key in c for c in self.normalized_by_year[year])]
+
+    def year_of(self, crop):
+        years = self.years_for(crop)
+        return years[0] if years else None
+
+    def current_year(self, previous_plants, candidates=None):
+        """The year most of the previous plants belong to; ties go to the earlier year."""
+        counts = dict.fromkeys(candidates or self.years, 0)
+        for plant in previous_plants:
+            year = self.year_of(plant)
+            if year in counts:
+                counts[year] += 1
+        return max(counts, key=counts.get) if counts else None
+
+    def plan(self, previous_plants, years=PLAN_YEARS):
+        """Rotation plan for the next `years` seasons after the previous plants' year."""
+        years = max(1, min(years, MAX_PLAN_YEARS))
+        if not self.years:
+            return []
+        start = 0
+        known = [plant for plant in previous_plants if self.year_of(plant) is not None]
+        if known:
+            start = self.years.index(self.current_year(known)) + 1
+        plan = []
+        for offset in range(years):
+            year = self.years[(start + offset) % len(self.years)]
+            plan.append({
+                "year": year,
+                "group": self.groups[year],
+                "crops": self.crops_by_year[year],
+                "benefits": self.benefits[year],
+            })
+        return plan
@@ -0,0 +1,274 @@
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from crops import crop_registry
+from lru import LRUCache
+from metrics import stage
+from reference_data import reference_store
+from rotation import RotationIndex
+from seasons import MonthIndex, query_mask
+
+# Candidate crops, in the order submit() has always used to break ties.
+CROPS = (
+    "Peas", "Fava Beans", "Onions", "Leeks", "Garlic",
+    "Greens (Collards, Kale, Mustard)", "Turnips", "White Potatoes",
+    "Cabbage", "Lettuce", "Radishes", "Beets", "Carrots",
+    "Shallots", "Spinach", "Bok Choy", "Parsley", "Swiss Chard",
+    "Celery", "Watermelons", "Winter Squash", "Melons",
+    "Summer Squash", "Cucumbers", "Pumpkins", "Sweet Potatoes",
+    "Okra", "Chinese Cabbage", "Sweet Corn", "Peanuts",
+    "Lima Beans", "Beans (Bush, Pole, Shell, Dried)", "Black-Eyed Peas",
+    "Eggplant", "Peppers", "Tomato", "Basil", "Gandules (Pigeon Peas)",
+)
+
+CRITERIA = ("ph", "nitrogen", "phosphorus", "potassium", "water", "water_source", "sow", "harvest", "rotation")
+WEIGHTS = np.array([8, 10, 9, 9, 10, 7, 8, 7, 10], dtype=np.int64)
+
+# (table, crop column, low column, high column) for each range criterion.
+RANGE_COLUMNS = (
+    ("phToCrops", "Crop", "Low pH Acceptable", "High pH Acceptable"),
+    ("nutrientsToCrops", "Crop", "Nitrogen (N) Low", "Nitrogen (N) High"),
+    ("nutrientsToCrops", "Crop", "Phosphorus (P) Low", "Phosphorus (P) High"),
+    ("nutrientsToCrops", "Crop", "Potassium (K) Low", "Potassium (K) High"),
+    ("waterToCrops", "Crop", "Min Water (mm)", "Max Water (mm)"),
+)
+WATER_SOURCE_COLUMNS = ("Rainfall", "Irrigated", "Groundwater", "Surface Water")
+WATER_SOURCE_FIELDS = ("rainfall", "irrigated", "groundwater", "surfacewater")
+ROTATION_YEARS = ("Year 1", "Year 2", "Year 3", "Year 4")
+
+TOP_K = 7
+RECOMMENDATION_CACHE_SIZE = int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 4096))
+
+log = logging.getLogger(__name__)
+
+
+def _yes(value):
+    return value is True or str(value or "").lower() == "yes"
+
+
+def _split(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return str(value).split(", ")
+
+
+def parse_profile(form):
+    """Reads the scoring inputs of a /submit form (or any mapping with the same keys)."""
+    previous = form.get("previousPlants")
+    sow = form.get("wantedSow")
+    harvest = form.get("wantedHarvest")
+    return {
+        "soil_ph": float(form.get("soil_ph") or 6.5),
+        "nitrogen": int(form.get("soilNit")),
+        "phosphorus": int(form.get("soilPho")),
+        "potassium": int(form.get("soilPot")),
+        "water_level": int(form.get("waterLevel")),
+        "water_sources": tuple(_yes(form.get(field)) for field in WATER_SOURCE_FIELDS),
+        "sow": _split(sow),
+        "harvest": _split(harvest),
+        "previous_plants": _split(previous) if previous else [],
+    }
+
+
+def _rows_by_crop(frame, column, registry):
+    """Crop id -> first row of frame naming that crop, whatever its spelling."""
+    rows = {}
+    names = frame[column].tolist()
+    for i, crop_id in enumerate(registry.ids_of(names).tolist()):
+        if crop_id < 0:
+            log.warning("Unknown crop %r in reference column %r", names[i], column)
+        else:
+            rows.setdefault(crop_id, i)
+    return rows
+
+
+def _candidate_rows(frame, column, crop_ids, registry):
+    """(candidate positions, table rows) of the candidates the table has a row for."""
+    rows = _rows_by_crop(frame, column, registry)
+    found = [(i, rows[c]) for i, c in enumerate(crop_ids.tolist()) if c in rows]
+    at = np.array([i for i, _ in found], dtype=np.int64)
+    return at, np.array([r for _, r in found], dtype=np.int64)
+
+
+class CropScorer:
+    """Scores crops against farm profiles with a precomputed crops x criteria matrix.
+
+    Every range criterion becomes a pair of lower/upper bound columns, so a
+    profile is scored with a handful of NumPy comparisons and one weighted
+    sum. Table rows are matched to candidates by crop id, so spelling
+    differences between workbooks don't matter; crops missing from a table
+    get bounds that can never match.
+    """
+
+    def __init__(self, tables, crops=CROPS, version=None, registry=crop_registry):
+        self.crops = tuple(crops)
+        self.crop_ids = registry.ids_of(self.crops)
+        self.version = version
+        n = len(self.crops)
+
+        self.lower = np.full((n, len(RANGE_COLUMNS)), np.inf)
+        self.upper = np.full((n, len(RANGE_COLUMNS)), -np.inf)
+        for j, (table, crop_col, low_col, high_col) in enumerate(RANGE_COLUMNS):
+            frame = tables[table]
+            at, rows = _candidate_rows(frame, crop_col, self.crop_ids, registry)
+            self.lower[at, j] = frame[low_col].to_numpy(dtype=float)[rows]
+            self.upper[at, j] = frame[high_col].to_numpy(dtype=float)[rows]
+        # Sorted distinct bounds per range criterion: two values falling between
+        # the same neighbouring bounds match exactly the same crops.
+        self.bounds = [(_distinct(self.lower[:, j]), _distinct(self.upper[:, j])) for j in range(len(RANGE_COLUMNS))]
+
+        water = tables["waterToCrops"]
+        at, rows = _candidate_rows(water, "Crop", self.crop_ids, registry)
+        self.water_sources = np.zeros((n, len(WATER_SOURCE_COLUMNS)), dtype=bool)
+        self.water_sources[at] = water[list(WATER_SOURCE_COLUMNS)].to_numpy(dtype=bool)[rows]
+
+        timing = tables["timeToSowAndHarvest"]
+        at, rows = _candidate_rows(timing, "Crop Name", self.crop_ids, registry)
+        sowing = np.full(n, "", dtype=object)
+        harvest = np.full(n, "", dtype=object)
+        sowing[at] = timing["Sowing Time"].fillna("").to_numpy(dtype=object)[rows]
+        harvest[at] = timing["Harvest Time"].fillna("").to_numpy(dtype=object)[rows]
+        self.sow_index = MonthIndex(sowing.tolist())
+        self.harvest_index = MonthIndex(harvest.tolist())
+
+        self.rotation = RotationIndex(tables["cropRotationCycle"], registry)
+        # Candidate position of every crop id, -1 for crops that aren't candidates.
+        position = np.full(len(registry), -1, dtype=np.int64)
+        position[self.crop_ids[self.crop_ids >= 0]] = np.flatnonzero(self.crop_ids >= 0)
+        self.rotation_masks = {}
+        for year, crops_to_plant in self.rotation.crops_by_year.items():
+            ids = registry.ids_of(crops_to_plant)
+            at = position[ids[ids >= 0]]
+            mask = np.zeros(n, dtype=bool)
+            mask[at[at >= 0]] = True
+            self.rotation_masks[year] = mask
+
+    @classmethod
+    def from_store(cls, store=reference_store):
+        return cls(store.tables(), version=store.version())
+
+    def _rotation_mask(self, previous_plants):
+        """Candidates planted in the rotation year after most of previous_plants.
+
+        Previous plants are matched to rotation years literally, by crop id
+        or normalized substring. The pre-matrix submit() passed them to
+        pandas str.contains() as regexes, so names with parentheses, such as
+        "Greens(Collards,Kale,Mustard)" or the "Greens (Collards" piece of a
+        comma-split form value, never matched a year. They do now, which
+        changes the top 7 for such profiles.
+        """
+        year = self.rotation.current_year(previous_plants, ROTATION_YEARS)
+        return self.rotation_masks.get(year, np.zeros(len(self.crops), dtype=bool))
+
+    def profile_key(self, profile):
+        """Canonical form of a profile: equal keys get equal scores.
+
+        Each range value is replaced by its band between the table bounds,
+        months by their masks and previous plants by their rotation year,
+        so profiles that differ below the tables' resolution share a key.
+        """
+        values = (profile["soil_ph"], profile["nitrogen"], profile["phosphorus"],
+                  profile["potassium"], profile["water_level"])
+        bands = tuple(
+            None if value != value else (bisect_right(lower, value), bisect_left(upper, value))
+            for value, (lower, upper) in zip(values, self.bounds)
+        )
+        year = self.rotation.current_year(profile["previous_plants"], ROTATION_YEARS)
+        return (bands, tuple(bool(v) for v in profile["water_sources"]),
+                query_mask(profile["sow"]), query_mask(profile["harvest"]), year)
+
+    def criteria_matrix(self, profiles):
+        """Boolean (profiles x crops x criteria) matrix of satisfied criteria."""
+        m, n = len(profiles), len(self.crops)
+        values = np.array(
+            [[p["soil_ph"], p["nitrogen"], p["phosphorus"], p["potassium"], p["water_level"]] for p in profiles],
+            dtype=float,
+        ).reshape(m, 1, len(RANGE_COLUMNS))
+        sources = np.array([p["water_sources"] for p in profiles], dtype=bool).reshape(m, 1, -1)
+        sow = [query_mask(p["sow"]) for p in profiles]
+        harvest = [query_mask(p["harvest"]) for p in profiles]
+
+        matched = np.zeros((m, n, len(CRITERIA)), dtype=bool)
+        # The five range criteria are compared in one step.
+        with stage("score.ranges"):
+            matched[:, :, :5] = (self.lower <= values) & (self.upper >= values)
+        with stage("score.water_sources"):
+            matched[:, :, 5] = (self.water_sources & sources).any(axis=2)
+        with stage("score.sow"):
+            matched[:, :, 6] = self.sow_index.matches(sow)
+        with stage("score.harvest"):
+            matched[:, :, 7] = self.harvest_index.matches(harvest)
+        with stage("score.rotation"):
+            for k, p in enumerate(profiles):
+                matched[k, :, 8] = self._rotation_mask(p["previous_plants"])
+        return matched
+
+    def score_many(self, profiles):
+        return self.criteria_matrix(profiles).astype(np.int64) @ WEIGHTS
+
+    def score(self, profile):
+        return self.score_many([profile])[0]
+
+    def top_k_many(self, scores, k=TOP_K):
+        """Indices of the k best crops per row, ties broken by crop order."""
+        scores = np.atleast_2d(scores)
+        n = scores.shape[1]
+        k = min(k, n)
+        # Fold the crop position into the key so every key is unique and the
+        # ordering matches a stable descending sort of the scores.
+        keys = scores * n - np.arange(n)
+        top = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(keys, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    def recommend_many(self, profiles, k=TOP_K):
+        if not profiles:
+            return []
+        scores = self.score_many(profiles)
+        with stage("score.rank"):
+            top = self.top_k_many(scores, k)
+        return [[self.crops[i] for i in row] for row in top]
+
+    def recommend(self, profile, k=TOP_K):
+        return self.recommend_many([profile], k)[0]
+
+
+def _distinct(column):
+    return sorted(set(column[~np.isnan(column)].tolist()))
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+# Top crops by (scorer version, k, profile key); cleared when the scorer is rebuilt.
+recommendation_cache = LRUCache(RECOMMENDATION_CACHE_SIZE)
+
+
+def current_scorer(store=reference_store):
+    """Returns the shared scorer, rebuilding it when a reference workbook changes."""
+    global _scorer
+    version = store.version()
+    scorer = _scorer
+    if scorer is None or scorer.version != version:
+        with _scorer_lock:
+            if _scorer is None or _scorer.version != version:
+                _scorer = CropScorer.from_store(store)
+                recommendation_cache.clear()
+            scorer = _scorer
+    return scorer
+
+
+def recommend(profile, k=TOP_K, store=reference_store):
+    """The current scorer's top k crops for a profile, memoized by its profile key."""
+    scorer = current_scorer(store)
+    key = (scorer.version, k, scorer.profile_key(profile))
+    crops = recommendation_cache.get(key)
+    if crops is None:
+        crops = tuple(scorer.recommend(profile, k))
+        recommendation_cache.set(key, crops)
+    return list(crops)
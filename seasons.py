@@ -0,0 +1,84 @@
+import re
+
+import numpy as np
+
+MONTHS = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+ALL_MONTHS = (1 << len(MONTHS)) - 1
+
+_PART_SPLIT = re.compile(r"[,;/&+]|\band\b")
+_RANGE = re.compile(r"-|–|—|\bto\b|\bthrough\b|\bthru\b|\buntil\b")
+_WORD = re.compile(r"[a-z]+")
+
+
+def month_number(word):
+    """0-based month for a full or abbreviated (3+ letters) month name, else None."""
+    word = word.lower()
+    if len(word) < 3:
+        return None
+    for i, name in enumerate(MONTHS):
+        if name.startswith(word):
+            return i
+    return None
+
+
+def month_range(first, last):
+    """Mask of the months from first to last inclusive, wrapping past December."""
+    mask, month = 0, first
+    while True:
+        mask |= 1 << month
+        if month == last:
+            return mask
+        month = (month + 1) % len(MONTHS)
+
+
+def parse_months(text):
+    """Parses free text such as "March, April", "March-May" or "Nov to Feb" into a mask.
+
+    Words that are not month names ("Mid", "Late", ...) are ignored, so the
+    schedule strings used elsewhere in the app parse as well.
+    """
+    if not text:
+        return 0
+    mask = 0
+    for part in _PART_SPLIT.split(str(text).lower()):
+        months = [m for m in (month_number(w) for w in _WORD.findall(part)) if m is not None]
+        if not months:
+            continue
+        if len(months) > 1 and _RANGE.search(part):
+            mask |= month_range(months[0], months[-1])
+        else:
+            for month in months:
+                mask |= 1 << month
+    return mask
+
+
+def query_mask(tokens):
+    mask = 0
+    for token in tokens:
+        mask |= parse_months(token)
+    return mask
+
+
+class MonthIndex:
+    """12-bit month masks for a column of sowing or harvest windows.
+
+    A window query is a single bitwise AND over the mask array; the masks of
+    many queries can be matched at once by passing an array of query masks.
+    """
+
+    def __init__(self, windows):
+        self.masks = np.array([parse_months(w) for w in windows], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def _shared(self, query):
+        query = np.asarray(query, dtype=np.int64)
+        return self.masks & query[..., np.newaxis]
+
+    def matches(self, query):
+        """True where a crop's window shares at least one month with the query."""
+        return self._shared(query) != 0
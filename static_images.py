@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "images")
+BUILD_DIR = os.path.join(IMAGES_DIR, "build")
+# {"ai_yield.png": {"source": "<sha1>", "width": 1024, "height": 1024,
+#                   "variants": {"webp": [{"width": 320, "file": "ai_yield-320w.<hash>.webp"}, ...]}}}
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+WIDTHS = (320, 640, 960)
+# Best format first: the browser takes the first <source> it supports.
+FORMATS = {
+    "avif": {"mime": "image/avif", "options": {"quality": 50}},
+    "webp": {"mime": "image/webp", "options": {"quality": 80, "method": 6}},
+}
+# Variant names carry a content hash, so they can be cached forever.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _encode(image, fmt, width, stem, out_dir):
+    from PIL import Image
+
+    height = round(image.height * width / image.width)
+    resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+    tmp_path = os.path.join(out_dir, f".{stem}-{width}w.{fmt}.tmp")
+    resized.save(tmp_path, format=fmt.upper(), **FORMATS[fmt]["options"])
+    name = f"{stem}-{width}w.{_sha1(tmp_path)[:10]}.{fmt}"
+    os.replace(tmp_path, os.path.join(out_dir, name))
+    return {"width": width, "file": name}
+
+
+def build_images(source_dir=IMAGES_DIR, out_dir=BUILD_DIR, widths=WIDTHS, formats=tuple(FORMATS)):
+    """Writes resized variants of every source image and the manifest; returns the manifest.
+
+    Images whose content hasn't changed since the last build keep their
+    variants. Files in out_dir that the new manifest doesn't list are removed.
+    Needs Pillow, which is only required where this build runs.
+    """
+    from PIL import Image, features
+
+    usable = [fmt for fmt in formats if features.check(fmt)]
+    for fmt in set(formats) - set(usable):
+        log.warning("Pillow here cannot encode %s; skipping it", fmt)
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest(os.path.join(out_dir, "manifest.json"))
+    manifest = {}
+    for name in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, name)
+        if not name.lower().endswith(SOURCE_EXTENSIONS) or not os.path.isfile(path):
+            continue
+        source_hash = _sha1(path)
+        old = previous.get(name)
+        if (old and old["source"] == source_hash and set(old["variants"]) == set(usable)
+                and all(os.path.exists(os.path.join(out_dir, v["file"]))
+                        for variants in old["variants"].values() for v in variants)):
+            manifest[name] = old
+            continue
+        with Image.open(path) as image:
+            image.load()
+            if image.mode not in ("RGB", "RGBA"):
+                alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+                image = image.convert("RGBA" if alpha else "RGB")
+            sizes = sorted({w for w in widths if w < image.width} | {min(image.width, max(widths))})
+            stem = os.path.splitext(name)[0]
+            manifest[name] = {
+                "source": source_hash,
+                "width": image.width,
+                "height": image.height,
+                "variants": {fmt: [_encode(image, fmt, w, stem, out_dir) for w in sizes] for fmt in usable},
+            }
+        log.info("Built %d variants of %s", len(sizes) * len(usable), name)
+
+    keep = {v["file"] for entry in manifest.values() for variants in entry["variants"].values() for v in variants}
+    for name in os.listdir(out_dir):
+        if name != "manifest.json" and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    tmp_path = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, os.path.join(out_dir, "manifest.json"))
+    return manifest
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class ImageManifest:
+    """Looks up the built variants of a static image; reloads when the manifest changes."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._entries = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def entries(self):
+        try:
+            st = os.stat(self.path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._entries = load_manifest(self.path) if signature else {}
+                    self._signature = signature
+        return self._entries
+
+    def version(self):
+        self.entries()
+        return self._signature
+
+    def get(self, filename):
+        """Manifest entry for a path under static/images, e.g. 'images/ai_yield.png'."""
+        name = filename.split("/", 1)[1] if filename.startswith("images/") else filename
+        return self.entries().get(name)
+
+
+image_manifest = ImageManifest()
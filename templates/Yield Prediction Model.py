@@ -1,8 +1,21 @@
+import json
+import os
+
 import pandas as pd
 from sklearn.linear_model import LinearRegression
 import joblib
 import numpy as np
 
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data")
+
+
+def atomic_write(path, write):
+    # Write next to the target and rename over it, so the running app never
+    # picks up a half-written file.
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
 
 # Step 1: Create Sample Training Data with Rainfall in 30-50 Range
 data = pd.DataFrame({
@@ -27,9 +40,21 @@ print("\nModel Coefficients:", model.coef_)
 print("Model Intercept:", model.intercept_)
 
 # Save the trained model for future use
-joblib.dump(model, 'yield_model.pkl')
+atomic_write(os.path.join(DATA_DIR, 'yield_model.pkl'), lambda path: joblib.dump(model, path))
 print("\nModel saved as 'yield_model.pkl'.")
 
+# Export the coefficients so the app can predict with NumPy alone
+def write_params(path):
+    with open(path, 'w') as f:
+        json.dump({
+            'features': list(X.columns),
+            'coef': model.coef_.tolist(),
+            'intercept': float(model.intercept_),
+        }, f, indent=2)
+
+atomic_write(os.path.join(DATA_DIR, 'yield_model.json'), write_params)
+print("Model coefficients exported to 'yield_model.json'.")
+
 
 # Step 3: Generate New Prediction Data
 temperatures = np.linspace(40, 90, 20)
@@ -53,5 +78,35 @@ print(new_data)
 
 
 # Step 5: Export the Predicted Yields to a CSV File 
-new_data.to_csv('predicted_yields.csv', index=False)
+atomic_write(os.path.join(DATA_DIR, 'predicted_yields.csv'), lambda path: new_data.to_csv(path, index=False))
 print("\nPredicted yields exported to 'predicted_yields.csv'.")
+
+
+# Step 6: Predict Yields over a Dense Regular Grid
+# The app memory-maps yield_grid.npy and interpolates between grid points;
+# yield_grid.json describes each axis as start/step/size.
+grid_axes = [
+    {'name': 'temperature', 'start': 30.0, 'step': 1.0, 'size': 81},   # 30-110 F
+    {'name': 'rainfall', 'start': 0.0, 'step': 2.5, 'size': 61},       # 0-150 mm
+    {'name': 'soil_ph', 'start': 4.0, 'step': 0.1, 'size': 51},        # 4.0-9.0
+]
+axis_values = [axis['start'] + axis['step'] * np.arange(axis['size']) for axis in grid_axes]
+mesh = np.meshgrid(*axis_values, indexing='ij')
+grid_points = pd.DataFrame({axis['name']: m.ravel() for axis, m in zip(grid_axes, mesh)})
+grid = model.predict(grid_points).reshape(mesh[0].shape).astype(np.float32)
+
+
+def write_grid(path):
+    with open(path, 'wb') as f:
+        np.save(f, grid)
+
+
+def write_grid_meta(path):
+    with open(path, 'w') as f:
+        json.dump({'axes': grid_axes, 'target': 'predicted_yield'}, f, indent=2)
+
+
+# The metadata goes last: the app remaps the grid when it sees new metadata.
+atomic_write(os.path.join(DATA_DIR, 'yield_grid.npy'), write_grid)
+atomic_write(os.path.join(DATA_DIR, 'yield_grid.json'), write_grid_meta)
+print(f"\nYield grid of shape {grid.shape} exported to 'yield_grid.npy'.")
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _scratch_database(tmp_path_factory):
+    # Importing app builds the module-level app; keep it off the checked-in database.
+    path = tmp_path_factory.mktemp("db") / "module.db"
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{path}")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture
+def app(tmp_path):
+    import app as app_module
+
+    return app_module.create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}"})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,25 @@
+from scoring import ROTATION_YEARS, current_scorer, parse_profile
+
+FORM = {
+    "soil_ph": "6.5", "soilNit": "100", "soilPho": "50", "soilPot": "100", "waterLevel": "500",
+    "rainfall": "Yes", "irrigated": "Yes", "groundwater": "No", "surfacewater": "No",
+    "wantedSow": "February", "wantedHarvest": "April",
+}
+
+
+def test_previous_plants_with_parentheses_match_their_rotation_year():
+    scorer = current_scorer()
+    # Year 2 of the rotation table lists "Greens(Collards,Kale,Mustard)". As regexes
+    # these names matched no year, and the tie went to Year 1.
+    for previous in (["Greens(Collards,Kale,Mustard)"], ["Greens (Collards"]):
+        assert scorer.rotation.current_year(previous, ROTATION_YEARS) == "Year 2"
+    mask = scorer._rotation_mask(["Greens (Collards"])
+    planted = {scorer.crops[i] for i in mask.nonzero()[0]}
+    assert {"Cabbage", "Turnips", "Lettuce"} <= planted
+    assert "Peas" not in planted
+
+
+def test_previous_plants_form_value_is_split_on_commas():
+    profile = parse_profile(dict(FORM, previousPlants="Greens (Collards, Kale, Mustard), Turnips"))
+    assert profile["previous_plants"][0] == "Greens (Collards"
+    assert current_scorer().rotation.current_year(profile["previous_plants"], ROTATION_YEARS) == "Year 2"
@@ -0,0 +1,39 @@
+import re
+
+from crops import decode_suggestions, encode_suggestions
+
+GREENS = "Greens (Collards, Kale, Mustard)"
+
+# Scores Greens (Collards, Kale, Mustard) into the top 7.
+FORM = {
+    "soil_type": "Loamy", "soil_ph": "6.5", "soil_moisture": "30", "temperature": "60", "rainfallAmount": "50",
+    "location": "York", "soilNit": "100", "soilPho": "50", "soilPot": "100", "waterLevel": "500",
+    "rainfall": "Yes", "irrigated": "Yes", "groundwater": "No", "surfacewater": "No",
+    "wantedSow": "February", "wantedHarvest": "April", "previousPlants": "Cabbage, Turnips",
+    "crop_history": "Cabbage, Turnips",
+}
+
+
+def test_submit_keeps_crop_names_with_commas(app, client):
+    import app as app_module
+
+    assert client.post("/submit", data=FORM).status_code == 302
+    with app.app_context():
+        row = app_module.FarmData.query.order_by(app_module.FarmData.id.desc()).first()
+        suggestions = decode_suggestions(row.suggestions)
+    assert len(suggestions) == 7
+    assert GREENS in suggestions
+
+    html = client.get("/feature/Crop Recommendation").get_data(as_text=True)
+    items = re.findall(r'<li class="list-group-item">([^<]*)</li>', html)
+    assert [item.replace("&#39;", "'") for item in items] == suggestions
+
+    body = client.get(f"/api/recommendations/{row.id}").get_json()
+    assert body["suggestions"] == suggestions
+
+
+def test_decode_reads_json_and_comma_joined_rows():
+    crops = ["Peas", GREENS, "Beans (Bush, Pole, Shell, Dried)", "Okra"]
+    assert decode_suggestions(encode_suggestions(crops)) == crops
+    assert decode_suggestions(",".join(crops)) == crops
+    assert decode_suggestions(None) == []
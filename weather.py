@@ -0,0 +1,300 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import registry
+
+OPENWEATHER_BASE_URL = os.environ.get("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "41634f4abed439fd5c63967222a91b8b")
+CONNECT_TIMEOUT = float(os.environ.get("OPENWEATHER_CONNECT_TIMEOUT", 2.0))
+READ_TIMEOUT = float(os.environ.get("OPENWEATHER_READ_TIMEOUT", 4.0))
+# Fresh for CACHE_TTL seconds; after that served stale (while a background
+# refresh runs) until STALE_TTL. Failed lookups are remembered for ERROR_TTL.
+CACHE_TTL = float(os.environ.get("OPENWEATHER_CACHE_TTL", 600))
+STALE_TTL = float(os.environ.get("OPENWEATHER_STALE_TTL", 3600))
+ERROR_TTL = float(os.environ.get("OPENWEATHER_ERROR_TTL", 60))
+POOL_SIZE = 10
+# Background refresh of active users' cities; see WeatherPrefetcher.
+PREFETCH_INTERVAL = float(os.environ.get("WEATHER_PREFETCH_INTERVAL", 300))
+PREFETCH_CONCURRENCY = int(os.environ.get("WEATHER_PREFETCH_CONCURRENCY", 4))
+PREFETCH_RATE = float(os.environ.get("WEATHER_PREFETCH_RATE", 1.0))  # upstream calls per second
+PREFETCH_MAX_CITIES = int(os.environ.get("WEATHER_PREFETCH_MAX_CITIES", 500))
+# Current conditions for the weather pages, the 5-day forecast for Harvest Optimization.
+PREFETCH_ENDPOINTS = ("weather", "forecast")
+
+log = logging.getLogger(__name__)
+
+UPSTREAM_SECONDS = registry.histogram(
+    "farmer_weather_upstream_seconds", "OpenWeatherMap call latency by endpoint and outcome.", ("endpoint", "status"))
+
+
+class WeatherClient:
+    """Shared OpenWeatherMap client.
+
+    Requests go through one keep-alive session with strict connect/read
+    timeouts. Responses are cached per (endpoint, city); a stale entry is
+    returned immediately while one background fetch refreshes it, and
+    concurrent misses for the same city wait on a single upstream call.
+    """
+
+    def __init__(self, base_url=OPENWEATHER_BASE_URL, api_key=OPENWEATHER_API_KEY,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), ttl=CACHE_TTL, stale_ttl=STALE_TTL,
+                 error_ttl=ERROR_TTL, pool_size=POOL_SIZE, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                      "upstream_calls": 0, "upstream_errors": 0, "upstream_seconds": 0.0}
+
+    @staticmethod
+    def _key(endpoint, city):
+        return endpoint, " ".join(str(city).split()).lower()
+
+    def _fetch(self, endpoint, city):
+        self.stats["upstream_calls"] += 1
+        start = time.perf_counter()
+        payload = None
+        status = "error"
+        try:
+            r = self.session.get(
+                f"{self.base_url}/{endpoint}",
+                params={"q": city, "appid": self.api_key, "units": "imperial"},
+                timeout=self.timeout,
+            )
+            status = str(r.status_code)
+            if r.status_code == 200:
+                payload = r.json()
+            else:
+                log.warning("Weather lookup for %r returned HTTP %s", city, r.status_code)
+        except requests.Timeout:
+            status = "timeout"
+            log.warning("Weather lookup for %r timed out", city)
+        except (requests.RequestException, ValueError) as exc:
+            status = "error"
+            # The exception text includes the request URL, and with it the API key.
+            log.warning("Weather lookup for %r failed: %s", city, type(exc).__name__)
+        elapsed = time.perf_counter() - start
+        self.stats["upstream_seconds"] += elapsed
+        UPSTREAM_SECONDS.observe(elapsed, endpoint=endpoint, status=status)
+        if payload is None:
+            self.stats["upstream_errors"] += 1
+        return payload
+
+    def _fetch_coalesced(self, endpoint, city):
+        key = self._key(endpoint, city)
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            try:
+                return call.result(timeout=sum(self.timeout))
+            except Exception:
+                return None
+        payload = None
+        try:
+            payload = self._fetch(endpoint, city)
+            previous = self._cache.get(key)
+            if payload is not None or previous is None or previous[1] is None:
+                self._cache[key] = (time.monotonic(), payload)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.set_result(payload)
+        return payload
+
+    def _refresh(self, endpoint, city):
+        key = self._key(endpoint, city)
+        if key in self._inflight:
+            return
+        self._refresher.submit(self._fetch_coalesced, endpoint, city)
+
+    def get(self, endpoint, city):
+        """JSON payload for endpoint and city, or None if it could not be fetched."""
+        entry = self._cache.get(self._key(endpoint, city))
+        if entry is not None:
+            fetched_at, payload = entry
+            age = time.monotonic() - fetched_at
+            if payload is None:
+                if age < self.error_ttl:
+                    self.stats["hits"] += 1
+                    return None
+            elif age < self.ttl:
+                self.stats["hits"] += 1
+                return payload
+            elif age < self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                self._refresh(endpoint, city)
+                return payload
+        self.stats["misses"] += 1
+        return self._fetch_coalesced(endpoint, city)
+
+    def current(self, city):
+        """Current conditions for city (the /weather endpoint)."""
+        return self.get("weather", city)
+
+    def prefetch(self, city, endpoint="weather"):
+        """Fetches city now, replacing the cached entry whatever its age."""
+        return self._fetch_coalesced(endpoint, city)
+
+    def age(self, city, endpoint="weather"):
+        """Seconds since city was last fetched, or None if it never was."""
+        entry = self._cache.get(self._key(endpoint, city))
+        return time.monotonic() - entry[0] if entry is not None else None
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class WeatherPrefetcher:
+    """Keeps the weather and forecast of active users' cities warm in a WeatherClient.
+
+    Every `interval` seconds a daemon thread asks `cities_source` for the
+    cities to refresh and fetches each of `endpoints` for them with at most
+    `concurrency` requests in flight and no more than `rate` upstream calls
+    per second. With the interval below the client's TTL, page renders for
+    those cities are served from cache.
+
+    A cycle refreshes at most rate * interval / len(endpoints) cities, so
+    it fits in one interval and cycles start every `interval` seconds;
+    cities past that budget are reported as skipped, and a cycle that
+    still runs long (slow upstream) is counted as an overrun.
+    """
+
+    def __init__(self, client, cities_source, interval=PREFETCH_INTERVAL,
+                 concurrency=PREFETCH_CONCURRENCY, rate=PREFETCH_RATE, max_cities=PREFETCH_MAX_CITIES,
+                 endpoints=PREFETCH_ENDPOINTS):
+        self.client = client
+        self.cities_source = cities_source
+        self.endpoints = tuple(endpoints)
+        self.interval = interval
+        self.concurrency = concurrency
+        self.max_cities = max_cities
+        self.rate = rate
+        self.limiter = RateLimiter(rate)
+        self._stop = threading.Event()
+        self._thread = None
+        self.cycles = 0
+        self.failures = 0
+        self.overruns = 0
+        self.last_cycle = {}
+
+    def city_budget(self):
+        """Cities one cycle can refresh within `interval` at `rate` calls per second."""
+        if self.rate <= 0:
+            return self.max_cities
+        return min(self.max_cities, max(1, int(self.rate * self.interval / len(self.endpoints))))
+
+    def _refresh(self, task):
+        city, endpoint = task
+        self.limiter.wait()
+        return self.client.prefetch(city, endpoint) is not None
+
+    def run_once(self):
+        started = time.monotonic()
+        active = list(dict.fromkeys(c for c in self.cities_source() if c))
+        budget = self.city_budget()
+        cities, skipped = active[:budget], max(0, len(active) - budget)
+        tasks = [(city, endpoint) for city in cities for endpoint in self.endpoints]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="weather-prefetch") as pool:
+            ok = list(pool.map(self._refresh, tasks))
+        failed = ok.count(False)
+        max_age = {}
+        for endpoint in self.endpoints:
+            ages = [a for a in (self.client.age(c, endpoint) for c in cities) if a is not None]
+            max_age[endpoint] = max(ages) if ages else None
+        seconds = time.monotonic() - started
+        overrun = seconds > self.interval
+        self.cycles += 1
+        self.failures += failed
+        self.overruns += overrun
+        self.last_cycle = {
+            "started_at": time.time() - seconds,
+            "cities": len(cities),
+            "skipped": skipped,
+            "endpoints": list(self.endpoints),
+            "failed": failed,
+            "seconds": seconds,
+            "overrun": overrun,
+            "max_age_seconds": max_age,
+        }
+        if failed:
+            log.warning("Weather prefetch failed for %d of %d lookups", failed, len(tasks))
+        if skipped:
+            log.warning("Weather prefetch skipped %d of %d active cities (budget %d per %ss at %s calls/s)",
+                        skipped, len(active), budget, self.interval, self.rate)
+        if overrun:
+            log.warning("Weather prefetch cycle took %.0fs, longer than its %ss interval", seconds, self.interval)
+        return self.last_cycle
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception:
+                log.exception("Weather prefetch cycle failed")
+            # Cycles start every interval, so an entry is at most about one interval old.
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="weather-prefetcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        last = self.last_cycle
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval": self.interval,
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "overruns": self.overruns,
+            "city_budget": self.city_budget(),
+            # How far the newest completed cycle lags behind now.
+            "refresh_lag_seconds": time.time() - last["started_at"] if last else None,
+            "last_cycle": last,
+        }
+
+
+weather_client = WeatherClient()
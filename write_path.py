@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy import event, insert
+
+log = logging.getLogger(__name__)
+
+# Applied to every new SQLite connection. WAL lets readers proceed while a
+# writer commits and, with synchronous=NORMAL, only fsyncs at checkpoints.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+GROUP_COMMIT_MAX_BATCH = 64
+GROUP_COMMIT_MAX_DELAY = 0.002  # seconds to wait for more rows after the first
+GROUP_COMMIT_TIMEOUT = 10.0
+
+
+def apply_sqlite_pragmas(engine, pragmas=SQLITE_PRAGMAS):
+    """Sets pragmas on every connection the engine opens (SQLite only)."""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    # Connections opened before the listener was attached keep old settings.
+    engine.dispose()
+
+
+class GroupCommitter:
+    """Write-behind queue that inserts rows from many requests in one transaction.
+
+    insert() enqueues a row and blocks until the batch containing it has
+    committed, so a caller can read its own write straight afterwards. A
+    single writer thread drains up to max_batch rows, waiting at most
+    max_delay for stragglers, and commits them together: under burst load
+    many submits share one commit instead of queueing on the database lock.
+    """
+
+    def __init__(self, engine, table, max_batch=GROUP_COMMIT_MAX_BATCH, max_delay=GROUP_COMMIT_MAX_DELAY,
+                 timeout=GROUP_COMMIT_TIMEOUT):
+        self.engine = engine
+        self.table = table
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-committer", daemon=True)
+        self._thread.start()
+        self.batches = 0
+        self.rows = 0
+
+    def insert(self, values):
+        """Inserts one row; returns its primary key once committed."""
+        future = Future()
+        self._queue.put((values, future))
+        return future.result(timeout=self.timeout)
+
+    def _drain(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=self.max_delay))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        pk = self.table.primary_key.columns.values()[0]
+        while True:
+            batch = self._drain()
+            try:
+                with self.engine.begin() as conn:
+                    result = conn.execute(
+                        insert(self.table).returning(pk, sort_by_parameter_order=True),
+                        [values for values, _ in batch],
+                    )
+                    ids = result.scalars().all()
+            except Exception as exc:
+                log.exception("Group commit of %d rows failed", len(batch))
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), row_id in zip(batch, ids):
+                future.set_result(row_id)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "queued": self._queue.qsize(),
+            "mean_batch": self.rows / self.batches if self.batches else None,
+        }
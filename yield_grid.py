@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from reference_data import DATA_DIR
+
+GRID_PATH = os.path.join(DATA_DIR, "yield_grid.npy")
+# Axis metadata written next to the grid by the training script:
+# {"axes": [{"name": "temperature", "start": 30.0, "step": 1.0, "size": 81}, ...]}
+GRID_META_PATH = os.path.join(DATA_DIR, "yield_grid.json")
+
+
+class YieldGrid:
+    """Regular 3-D grid of predicted yields, read through a memory map.
+
+    A query is index arithmetic on the axis start/step plus trilinear
+    interpolation of the eight surrounding cells. The mapped file is shared
+    by every process that opens it, so workers don't each hold a copy.
+    """
+
+    def __init__(self, values, axes, signature=None):
+        self.values = values
+        self.names = tuple(axis["name"] for axis in axes)
+        self.start = np.array([axis["start"] for axis in axes], dtype=float)
+        self.step = np.array([axis["step"] for axis in axes], dtype=float)
+        self.size = np.array([axis["size"] for axis in axes], dtype=np.int64)
+        self.stop = self.start + self.step * (self.size - 1)
+        self.signature = signature
+        if tuple(values.shape) != tuple(self.size):
+            raise ValueError(f"Grid shape {values.shape} does not match its axes {tuple(self.size)}")
+
+    @classmethod
+    def load(cls, path=GRID_PATH, meta_path=GRID_META_PATH, signature=None):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return cls(np.load(path, mmap_mode="r"), meta["axes"], signature)
+
+    def contains(self, points):
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        return ((points >= self.start) & (points <= self.stop)).all(axis=1)
+
+    def predict_many(self, points):
+        """Trilinear interpolation at each point; points outside the grid are clamped to its edge."""
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        pos = np.clip((points - self.start) / self.step, 0, self.size - 1)
+        lower = np.minimum(np.floor(pos).astype(np.int64), np.maximum(self.size - 2, 0))
+        frac = pos - lower
+        upper = np.minimum(lower + 1, self.size - 1)
+        result = np.zeros(len(points))
+        for corner in range(8):
+            bits = [(corner >> axis) & 1 for axis in range(3)]
+            idx = tuple(np.where(bits[axis], upper[:, axis], lower[:, axis]) for axis in range(3))
+            weight = np.prod([frac[:, axis] if bits[axis] else 1 - frac[:, axis] for axis in range(3)], axis=0)
+            result += weight * self.values[idx]
+        return result
+
+    def predict(self, *values):
+        return float(self.predict_many([values])[0])
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+
+def current_yield_grid(path=GRID_PATH, meta_path=GRID_META_PATH):
+    """Returns the shared grid, or None if none has been generated.
+
+    The grid is remapped when its metadata file changes; the training script
+    writes the metadata last, after the new grid is in place.
+    """
+    global _grid
+    try:
+        st = os.stat(meta_path)
+    except FileNotFoundError:
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    grid = _grid
+    if grid is None or grid.signature != signature:
+        with _grid_lock:
+            if _grid is None or _grid.signature != signature:
+                _grid = YieldGrid.load(path, meta_path, signature)
+            grid = _grid
+    return grid
@@ -0,0 +1,102 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from reference_data import DATA_DIR
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is optional; fall back to a vectorized brute-force search.
+    cKDTree = None
+
+FEATURES = ("temperature", "rainfall", "soil_ph")
+TARGET = "predicted_yield"
+PREDICTIONS_PATH = os.path.join(DATA_DIR, "predicted_yields.csv")
+DEFAULT_K = 3
+# Rows per block in the brute-force search, to bound the distance matrix size.
+QUERY_BLOCK = 1024
+
+
+class YieldIndex:
+    """Nearest-neighbour index over a table of precomputed yield predictions.
+
+    Features are standardized before indexing so temperature (tens of
+    degrees) does not swamp soil pH (tenths). Predictions interpolate the k
+    nearest rows by inverse distance.
+    """
+
+    def __init__(self, points, yields, signature=None):
+        points = np.asarray(points, dtype=float)
+        self.yields = np.asarray(yields, dtype=float)
+        self.mean = points.mean(axis=0)
+        scale = points.std(axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0)
+        self.points = (points - self.mean) / self.scale
+        self.signature = signature
+        self._tree = cKDTree(self.points) if cKDTree is not None else None
+
+    @classmethod
+    def from_csv(cls, path=PREDICTIONS_PATH):
+        st = os.stat(path)
+        frame = pd.read_csv(path)
+        return cls(frame[list(FEATURES)].to_numpy(), frame[TARGET].to_numpy(),
+                   signature=(st.st_mtime_ns, st.st_size))
+
+    def __len__(self):
+        return len(self.yields)
+
+    def _standardize(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=float))
+        return (queries - self.mean) / self.scale
+
+    def query(self, queries, k=DEFAULT_K):
+        """Distances and row indices of the k nearest rows, each shaped (n, k)."""
+        q = self._standardize(queries)
+        k = max(1, min(k, len(self)))
+        if self._tree is not None:
+            dist, idx = self._tree.query(q, k=k)
+            return dist.reshape(len(q), k), idx.reshape(len(q), k)
+        dist = np.empty((len(q), k))
+        idx = np.empty((len(q), k), dtype=np.int64)
+        for start in range(0, len(q), QUERY_BLOCK):
+            block = q[start:start + QUERY_BLOCK]
+            d2 = ((block[:, np.newaxis, :] - self.points[np.newaxis, :, :]) ** 2).sum(axis=2)
+            part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            part_d2 = np.take_along_axis(d2, part, axis=1)
+            order = np.argsort(part_d2, axis=1)
+            idx[start:start + len(block)] = np.take_along_axis(part, order, axis=1)
+            dist[start:start + len(block)] = np.sqrt(np.take_along_axis(part_d2, order, axis=1))
+        return dist, idx
+
+    def predict_many(self, queries, k=DEFAULT_K):
+        """Inverse-distance weighted yield for each (temperature, rainfall, soil_ph) row."""
+        dist, idx = self.query(queries, k)
+        neighbours = self.yields[idx]
+        exact = dist[:, 0] == 0
+        weights = 1.0 / np.where(dist == 0, 1.0, dist)
+        result = (weights * neighbours).sum(axis=1) / weights.sum(axis=1)
+        result[exact] = neighbours[exact, 0]
+        return result
+
+    def predict(self, temperature, rainfall, soil_ph, k=DEFAULT_K):
+        return float(self.predict_many([[temperature, rainfall, soil_ph]], k)[0])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def current_yield_index(path=PREDICTIONS_PATH):
+    """Returns the shared index, reloading it when the predictions file changes."""
+    global _index
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    index = _index
+    if index is None or index.signature != signature:
+        with _index_lock:
+            if _index is None or _index.signature != signature:
+                _index = YieldIndex.from_csv(path)
+            index = _index
+    return index